@@ -1,16 +1,28 @@
 from typing import Optional
+from collections.abc import Mapping
 from Altprint.utils.base import BasePrint
 from Altprint.utils.slicer import STLSlicer, SlicedPlanes
-from Altprint.utils.layer import Layer, Raster, ContinuousLayer
+from Altprint.utils.slice_cache import SliceCache
+from Altprint.utils.section_simplify import SectionSimplifier, SimplifyReport
+from Altprint.utils.layer import Layer, ContinuousLayer
+from Altprint.utils.offsets import LayerOffsets
+from Altprint.utils.layer_cache import LayerCache
+from Altprint.utils.pipeline import ThreadPipeline
+from Altprint.utils.shared_geometry import (SharedHandle, start_transport, share_geometries, read_geometries, release,
+                                             discard)
+from Altprint.utils.toolpath import LayerToolpath, PERIMETER, INFILL, FLEX, RETRACT, WALK_AROUND
+from Altprint.utils.stage_deps import StageTracker
+from Altprint.utils.angle_search import AngleSearch
 from Altprint.utils.height_method import StandartHeightMethod
 from Altprint.utils.rectilinear_infill import RectilinearInfill
 from Altprint.utils.gcode import GcodeExporter
-from Altprint.utils.lineutil import split_by_regions, retract
+from Altprint.utils.lineutil import retract
+from Altprint.utils.flex_tagging import RegionTagger, NORMAL, GAP
 from Altprint.utils.settingsparser import SettingsParser
 
 from Altprint.utils.horizontal_gaps import create_gaps
-from tqdm import tqdm
 import shapely as sp
+import copy
 import sys
 
 # from Altprint.best_path import *
@@ -56,6 +68,24 @@ class FlexProcess():  # definição da classe responsável por controlar os par
             "verbose": True,
             "threshold_walk_around": 300,
             "apply_walk_around": False,
+            "slice_cache_dir": "",
+            "slice_cache_size": 512,
+            "slice_engine": None,
+            "slice_workers": 1,
+            "stream_slicing": False,
+            "stl_loader": None,
+            "decimate_tolerance": 0,
+            "section_simplify_tolerance": 0,
+            "section_snap_grid": 0,
+            "joint_slicing": False,
+            "reuse_layers": False,
+            "layer_workers": 1,
+            "layer_execution": "",
+            "pipeline_queue_size": 2,
+            "shared_memory_transport": False,
+            "infill_angle_search": False,
+            "angle_cost": "travel",
+            "angle_workers": 1,
         }
         # loop que percorre todos os itens do dicionário "prop_defaults". Para cada item, ele usa a função "setattr" para definir um atributo na instância atual com o nome "prop" e o valor correspondente de kwargs se ele existir, caso contrário, ele usa o valor padrão default.
         for (prop, default) in prop_defaults.items():
@@ -82,21 +112,102 @@ class FlexPrint(BasePrint):  # definição da classe responsável por implementa
         self.layers: _layers_dict = {}
         # lista vazia que armazena os valores das alturas como float
         self.heights: list[float] = []
+        # espessura de cada camada usada no fluxo, vazio quando todas usam a altura padrão (HeightMethod.get_thicknesses)
+        self.layer_thicknesses: dict[float, float] = {}
         self.sliced_planes: Optional[SlicedPlanes] = None
         self.flex_planes: Optional[SlicedPlanes] = None
+        # slicers do modelo e da região flexível no modo de fatiamento sob demanda (stream_slicing)
+        self._model_slicer: Optional[STLSlicer] = None
+        self._flex_slicer: Optional[STLSlicer] = None
+        # contagem de vértices das seções antes e depois da simplificação, do modelo e da região flexível
+        self.simplify_reports: dict[str, SimplifyReport] = {}
         self.last_loop = []
+        self.layer_cache: Optional[LayerCache] = None
+        # camadas processadas uma de cada vez (tudo menos layer_execution "thread"): o ponto de entrada já é conhecido
+        # no estágio "offsets", e um acerto no cache pula também os anéis, a borda e o preenchimento sem ordem
+        self._early_cache_lookup = True
+        # utilização dos estágios da última execução em threads (layer_execution "thread")
+        self.layer_pipeline: Optional[ThreadPipeline] = None
+        # custos dos ângulos candidatos e ângulo escolhido em cada camada (infill_angle_search)
+        self.angle_search: Optional[AngleSearch] = None
+        # last_loop na entrada e na saída de cada camada gerada, usados para regenerar só parte das camadas (update_flex)
+        self.loop_states: dict[float, tuple] = {}
+        # parâmetros com que cada estágio rodou por último e o trabalho de cada camada, para refazer só o necessário
+        self.stage_tracker = StageTracker()
+        self._works: dict[float, _LayerWork] = {}
+        # camadas geradas sob demanda (layer_at), sem passar por make_layers
+        self.lazy_layers = LazyLayers(self)
 
     def slice(self):  # método que fatia modelo 3D e calcula as alturas das camadas
+        self.stage_tracker.invalidate("slicing")  # camadas e gcode anteriores não valem para as novas seções
+        self.lazy_layers = LazyLayers(self)  # as camadas sob demanda dependem das seções
         if self.process.verbose is True:
             print("slicing {} ...".format(self.process.model_file))
         # atribui as configurações dos parâmetros de impressão como um objeto da classe STLSlicer
         slicer = self.process.slicer
+        # cache em disco dos planos fatiados, o tamanho máximo é dado em MB
+        if self.process.slice_cache_dir and slicer.cache is None:
+            slicer.cache = SliceCache(self.process.slice_cache_dir, self.process.slice_cache_size * 2**20)
+        # motor de fatiamento ("trimesh" ou "sweep"), se não definido mantém o do slicer
+        if self.process.slice_engine:
+            slicer.engine = self.process.slice_engine
+        # leitor de stl ("trimesh" ou "mmap"), se não definido mantém o do slicer
+        if self.process.stl_loader:
+            slicer.loader = self.process.stl_loader
+        # simplificação da malha antes do fatiamento, tolerância cordal em mm
+        if self.process.decimate_tolerance:
+            slicer.decimate_tolerance = self.process.decimate_tolerance
+        # processos que fatiam faixas de alturas em paralelo
+        if self.process.slice_workers > 1:
+            slicer.workers = self.process.slice_workers
+            # seções das faixas devolvidas por memória compartilhada em vez de pickle
+            slicer.shared_transport = self.process.shared_memory_transport
         # método dentro da Classe STLSlicer que lê o arquivo do objeto 3D referente a região normal (em stl) determinado no arquivo yml
         slicer.load_model(self.process.model_file)
         # método dentro da Classe STLSlicer que translada o objeto no plano 3D para um offset determinado no arquivo yml
         slicer.translate_model(self.process.offset)
+        if self.process.stream_slicing:
+            # só calcula as alturas, as seções são fatiadas sob demanda enquanto make_layers consome iter_sections
+            self.sliced_planes, self.flex_planes = None, None
+            self.heights = slicer.get_heights()
+            self._set_layer_thicknesses(slicer.get_bounds())
+            self._report_decimation(slicer)
+            self._model_slicer = slicer
+            self._flex_slicer = copy.copy(slicer)  # sem cache, segunda malha carregada ao mesmo tempo que a do modelo
+            self._flex_slicer.load_model(self.process.flex_model_file)
+            self._flex_slicer.translate_model(self.process.offset)
+            self._report_decimation(self._flex_slicer)
+            self.simplify_reports = {"model": SimplifyReport(self.process.model_file),
+                                     "flex": SimplifyReport(self.process.flex_model_file)}
+            self.stage_tracker.record(self.process, ("slicing", ))
+            return
+        if self.process.joint_slicing:
+            # modelo e região flexível carregados e fatiados juntos, nas alturas do modelo
+            self.sliced_planes, self.flex_planes = slicer.slice_joint(self.process.flex_model_file)
+            self._report_decimation(slicer)
+            self._report_decimation(slicer.joint_flex_slicer)
+            self.heights = self.sliced_planes.get_heights()
+        else:
+            self._slice_separately(slicer)
+        self._set_layer_thicknesses(self.sliced_planes.bounds)
+
+        simplifier = self._section_simplifier()
+        if simplifier is not None:
+            # novos objetos SlicedPlanes, as entradas do cache continuam com as seções originais
+            reports = {"model": SimplifyReport(self.process.model_file),
+                       "flex": SimplifyReport(self.process.flex_model_file)}
+            self.sliced_planes = SlicedPlanes(simplifier.apply(self.sliced_planes.planes, reports["model"]),
+                                              self.sliced_planes.bounds)
+            self.flex_planes = SlicedPlanes(simplifier.apply(self.flex_planes.planes, reports["flex"]),
+                                            self.flex_planes.bounds)
+            self.simplify_reports = reports
+            self._report_simplification()
+        self.stage_tracker.record(self.process, ("slicing", ))
+
+    def _slice_separately(self, slicer):
         # método dentro da Classe STLSlicer que fatia o objeto 3D em uma quantidade de planos igual ao numero de camadas
         self.sliced_planes = slicer.slice_model()
+        self._report_decimation(slicer)
         # método da classe StandartHeightMethod, calcula e retorna uma lista com as alturas de cada camada
         self.heights = self.sliced_planes.get_heights()
 
@@ -106,155 +217,734 @@ class FlexPrint(BasePrint):  # definição da classe responsável por implementa
         slicer.translate_model(self.process.offset)
         # método dentro da Classe STLSlicer que fatia o objeto 3D em uma quantidade de planos igual ao numero de camadas (que é obtido através do tamanho do vetor que armazena as alturas de cada camada)
         self.flex_planes = slicer.slice_model(self.heights)
+        self._report_decimation(slicer)
+
+    def _set_layer_thicknesses(self, bounds):
+        # espessura de cada camada para o cálculo do fluxo, só nos métodos de altura variável (AdaptiveHeightMethod);
+        # as demais camadas usam a altura padrão de flow.calculate
+        thicknesses = self.process.slicer.height_method.get_thicknesses(bounds, self.heights)
+        self.layer_thicknesses = dict(zip(self.heights, thicknesses)) if thicknesses is not None else {}
+
+    def _section_simplifier(self) -> Optional[SectionSimplifier]:
+        # simplificação das seções depois do fatiamento, desligada quando tolerância e grade são 0
+        if self.process.section_simplify_tolerance or self.process.section_snap_grid:
+            return SectionSimplifier(self.process.section_simplify_tolerance, self.process.section_snap_grid)
+        return None
+
+    def _report_simplification(self):
+        if self.process.verbose is True:
+            for report in self.simplify_reports.values():
+                print(report)
+
+    def _report_decimation(self, slicer):
+        # a malha só é carregada (e simplificada) quando o fatiamento não vem do cache
+        if self.process.verbose is True and slicer.decimation_report is not None:
+            print("{}: {}".format(slicer.model_file, slicer.decimation_report))
+
+    def iter_sections(self):
+        """Yields (height, model_section, flex_section) in height order"""
+        if self.sliced_planes is not None:
+            for height in self.heights:
+                yield height, self.sliced_planes.planes[height], self.flex_planes.planes[height]
+            return
+        # modo stream: cada par de seções é fatiado só quando a camada é gerada e não fica guardado
+        model_planes = self._model_slicer.iter_planes()
+        flex_planes = self._flex_slicer.iter_planes(self.heights)
+        simplifier = self._section_simplifier()
+        for (height, section), (_, flex_section) in zip(model_planes, flex_planes):
+            if simplifier is not None:
+                section = simplifier.apply({height: section}, self.simplify_reports["model"])[height]
+                flex_section = simplifier.apply({height: flex_section}, self.simplify_reports["flex"])[height]
+            yield height, section, flex_section
+        if simplifier is not None:
+            self._report_simplification()
 
     def make_layers(self):  # método que gera as trajetórias das camadas, desde a saia inicial, e o perímetro/contorno e o preenchimento de cada camada
         if self.process.verbose is True:  # linha de verificação fornecida dentro das configurações do próprio arquivo yml
             # mensagem quando executa essa função do programa
             print("generating layers ...")
+        from tqdm import tqdm  # barra de progresso, importada só quando as camadas são geradas
+        self._start_layers()
+        self.stage_tracker.invalidate("offsets")
+        self._works = {}
+
+        # cada camada passa pelos estágios em ordem; só o estágio "split" depende da camada anterior (last_loop)
+        stages = [("offsets", self._stage_offsets),
+                  ("infill", self._stage_infill),
+                  ("split", self._stage_split),
+                  ("rasters", self._stage_rasters)]
+        execution = self._layer_execution()
+        self._early_cache_lookup = execution != "thread"
+        # loop que percorre todas as alturas na lista "heights", recebendo junto as seções do modelo e da região flexível
+        # com execução "process" os perímetros, bordas e preenchimentos sem ordem vêm calculados de um pool de processos
+        workers = self.process.layer_workers if execution == "process" else 1
+        works = (_LayerWork(height, section, flex_section, prepared) for height, section, flex_section, prepared
+                 in self._iter_prepared(self.iter_sections(), workers))
+        progress = tqdm(total=len(self.heights), desc="Generating layers")
+        results = None
+        try:
+            if execution == "thread":
+                # estágios em threads, camadas diferentes em estágios diferentes ao mesmo tempo
+                self.layer_pipeline = ThreadPipeline(stages, self.process.pipeline_queue_size)
+                results = self.layer_pipeline.run(works)
+                for work in results:
+                    self._keep_layer(work)
+                    progress.update()
+            else:
+                for work in works:
+                    for _, stage in stages:
+                        work = stage(work)
+                    self._keep_layer(work)
+                    progress.update()
+        finally:
+            # o pipeline para suas threads antes, e a fonte libera os blocos de memória compartilhada ainda na fila
+            if results is not None:
+                results.close()
+            works.close()
+            self._early_cache_lookup = True
+            if self.angle_search is not None:
+                self.angle_search.close()
+        progress.close()
+        self.stage_tracker.record(self.process, ("offsets", "infill", "ordering", "split", "rasters"))
+
+        if self.layer_pipeline is not None and self.process.verbose is True:
+            print(self.layer_pipeline.report())
+        if self.layer_cache is not None and self.process.verbose is True:
+            print(self.layer_cache)
+        if self.angle_search is not None and self.process.verbose is True:
+            print(self.angle_search.report())
+
+    def update_flex(self, flex_model_file: Optional[str] = None) -> list[float]:
+        """
+        Incremental update after an edit of the flex model only: slices the new flex model, compares its sections
+        with the previous ones at each height and regenerates only the layers whose flex section changed, plus the
+        layers above them whose entry point (last_loop) changed as a result. Every other layer is kept.
+
+        ARGS:
+        flex_model_file: new flex model, the current one (edited in place) if not given (str)
+
+        RETURNS:
+        Heights of the regenerated layers
+        """
+        if flex_model_file:
+            self.process.flex_model_file = flex_model_file
+        if self.sliced_planes is None:
+            raise ValueError("update_flex needs the sections kept in memory (stream_slicing off)")
+        old_planes = self.flex_planes
+        slicer = self.process.slicer
+        if self.process.joint_slicing:
+            # mesmo caminho do slice(): seções vazias fora dos limites do modelo
+            self.flex_planes = slicer.slice_joint_flex(self.process.flex_model_file, self.heights,
+                                                       self.sliced_planes.bounds)
+            self._report_decimation(slicer.joint_flex_slicer)
+        else:
+            slicer.load_model(self.process.flex_model_file)
+            slicer.translate_model(self.process.offset)
+            self.flex_planes = slicer.slice_model(self.heights)
+            self._report_decimation(slicer)
+        simplifier = self._section_simplifier()
+        if simplifier is not None:
+            self.simplify_reports["flex"] = SimplifyReport(self.process.flex_model_file)
+            self.flex_planes = SlicedPlanes(simplifier.apply(self.flex_planes.planes, self.simplify_reports["flex"]),
+                                            self.flex_planes.bounds)
+        self.lazy_layers = LazyLayers(self)
+        self.stage_tracker.record(self.process, ("slicing", ))
+        if not self.layers:  # nenhuma camada anterior para reaproveitar
+            self.make_layers()
+            return list(self.heights)
+
+        # seções comparadas exatamente (WKB), qualquer vértice diferente regenera a camada
+        changed = {height for height in self.heights
+                   if sp.to_wkb(old_planes.planes[height]) != sp.to_wkb(self.flex_planes.planes[height])}
+        regenerated = []
+        last_loop = self.last_loop
+        entry = None  # last_loop alterado por uma camada regenerada, que muda a entrada das de cima
+        for height in self.heights:
+            # camadas vazias não têm trajetória nem alteram o last_loop
+            if self.layers[height].shape == [] or (height not in changed and entry is None):
+                continue
+            old_entry, old_exit = self.loop_states[height]
+            self.last_loop = old_entry if entry is None else entry
+            work = _LayerWork(height, self.sliced_planes.planes[height], self.flex_planes.planes[height])
+            for stage in (self._stage_offsets, self._stage_infill, self._stage_split, self._stage_rasters):
+                work = stage(work)
+            self._keep_layer(work)
+            regenerated.append(height)
+            # a camada de cima só muda se esta terminar em outro ponto
+            entry = None if _same_loop(self.last_loop, old_exit) else self.last_loop
+        self.last_loop = last_loop
+        if self.angle_search is not None:
+            self.angle_search.close()
+        if self.process.verbose is True:
+            print("flex update: {} of {} layers regenerated".format(len(regenerated), len(self.heights)))
+        return regenerated
+
+    def _keep_layer(self, work: "_LayerWork"):
+        # a camada vai para o dicionário "layers" e o trabalho fica guardado para refazer só os rasters
+        work.prepared = None
+        self.layers[work.height] = work.layer
+        self._works[work.height] = work
+
+    def rebuild_rasters(self):
+        """
+        Rebuilds the toolpath of every layer from its ordered and split paths, kept by make_layers. Enough when
+        only the flows, speeds or retract ratio changed: no slicing, offsets, infill or path ordering.
+        """
+        toolpaths = {}  # cache key -> rebuilt toolpath, shared with the layers copied from the cache
+        for work in self._works.values():
+            layer = work.layer
+            if layer.shape == []:
+                continue
+            # camadas com a mesma chave compartilham o toolpath refeito pela primeira; uma cópia do cache guarda os
+            # caminhos divididos e se refaz sozinha se a camada original foi substituída (update_flex)
+            if work.cache_key in toolpaths:
+                layer.toolpath = toolpaths[work.cache_key]
+                continue
+            layer.toolpath = LayerToolpath(self.layer_thicknesses.get(work.height))
+            self._add_rasters(work)
+            if work.cache_key is not None:
+                toolpaths[work.cache_key] = layer.toolpath
+        self.stage_tracker.record(self.process, ("rasters", ))
+
+    def build(self, filename: Optional[str] = None) -> list[str]:
+        """
+        Slices, generates the layers and exports the gcode, running again only the stages downstream of the
+        parameters changed since the last run (see stage_deps.STAGE_PARAMS). A sweep over flows or speeds costs one
+        full run plus a rebuild of the rasters and an export per value.
+
+        ARGS:
+        filename: gcode file, nothing is exported if not given (str)
+
+        RETURNS:
+        Stages that ran
+        """
+        dirty = self.stage_tracker.first_dirty(self.process)
+        ran = []
+        if dirty == "slicing":
+            self.slice()
+            ran.append("slicing")
+        if dirty in ("slicing", "offsets", "infill", "ordering", "split") or not self._works:
+            # os estágios de uma camada rodam juntos, camada a camada, em make_layers
+            self.make_layers()
+            ran.extend(("offsets", "infill", "ordering", "split", "rasters"))
+        elif dirty == "rasters":
+            self.rebuild_rasters()
+            ran.append("rasters")
+        if filename:
+            self.export_gcode(filename)
+            self.stage_tracker.record(self.process, ("gcode", ))
+            ran.append("gcode")
+        if self.process.verbose is True:
+            print("stages run: {}".format(", ".join(ran) if ran else "none"))
+        return ran
+
+    def _start_layers(self):
+        # estado usado pelos estágios: método de preenchimento, saia, cache e parâmetros das camadas
+        # as camadas de uma execução anterior (outras alturas, se o fatiamento mudou) são descartadas, e a saia volta a
+        # começar sem ponto de entrada, como numa peça nova
+        self.layers = {}
+        self.loop_states = {}
+        self.last_loop = []
         # atribui as configurações dos parâmetros de impressão como um objeto da classe RectilinearInfill
-        infill_method = self.process.infill_method(flex_print_instance=self)
-
-        # lógica de construção da saia em volta da primeira camada da peça
-        # cria uma instância "skirt" da classe "Layer" que recebe os parâmetros da saia fornecidos pelo arquivo yml
-        skirt = ContinuousLayer(self.sliced_planes.planes[self.heights[0]],
-                      self.process.skirt_num,
-                      self.process.skirt_gap,
-                      - self.process.skirt_distance - self.process.skirt_gap * self.process.skirt_num,  # noqa: E501
-                      self.process.overlap,
-                      flex_print_instance=self)
-        # utiliza o método da classe "Layer" para criação do perímetro formado pela saia
-        skirt.make_perimeter()
-        # print("skirt: ", self.last_loop)
-
-        # loop que percorre todas as alturas na lista "heights". A função enumerate é usada para obter tanto o índice (i) quanto o valor (height) de cada altura.
-        i = 0
-        for height in tqdm(self.heights, desc="Generating layers"):
-            # para cada altura, é criado um novo objeto "Layer", que recebe os parãmetros referentes ao perímetro fornecidos pelo arquivo yml, e atribuído a "layer" que é referente a cada camada
-            layer = ContinuousLayer(self.sliced_planes.planes[height],
-                                    self.process.perimeter_num,
-                                    self.process.perimeter_gap,
-                                    self.process.external_adjust,
+        self._infill_method = self.process.infill_method(flex_print_instance=self)
+        self._skirt = None
+        # camadas com as mesmas seções e o mesmo ponto de entrada são copiadas em vez de recalculadas
+        self.layer_cache = LayerCache() if self.process.reuse_layers else None
+        self._layer_params_key = self._layer_params()
+        # com infill_angle_search, todos os ângulos de infill_angle são candidatos em cada camada
+        if self.process.infill_angle_search:
+            self.angle_search = AngleSearch(self.process.infill_angle, self.process.angle_cost,
+                                            self.process.angle_workers, self.process.speed,
+                                            self.process.travel_speed)
+        else:
+            self.angle_search = None
+
+    def section_at(self, height) -> tuple:
+        """(model_section, flex_section) of a layer height, sliced on demand in stream mode"""
+        if self.sliced_planes is not None:
+            return self.sliced_planes.planes[height], self.flex_planes.planes[height]
+        section = self._model_slicer._section_planes([height])[height]
+        flex_section = self._flex_slicer._section_planes([height])[height]
+        simplifier = self._section_simplifier()
+        if simplifier is not None:
+            section, flex_section = simplifier.simplify([section, flex_section])
+        return section, flex_section
+
+    def layer_at(self, height) -> tuple:
+        """
+        Generates a single layer and its gcode without generating the whole part: only the layers below it are
+        walked, and only as far as needed to know where the layer starts (see LazyLayers).
+
+        ARGS:
+        height: layer height, one of self.heights (float)
+
+        RETURNS:
+        (layer, gcode blocks of the layer, the same as in the exported file)
+        """
+        layer = self.lazy_layers[height]
+        gcode_exporter = self._gcode_exporter()
+        # o salto para o primeiro raster depende de onde o bico parou na camada anterior
+        gcode_exporter.head_x, gcode_exporter.head_y = self.lazy_layers.head_before(height)
+        gcode = []
+        gcode_exporter.toolpath_gcode(layer.toolpath, height, gcode)
+        return layer, gcode
+
+    def _advance_last_loop(self, work: "_LayerWork"):
+        # só o necessário para o last_loop da próxima camada: perímetro e preenchimento ordenados, sem a divisão
+        # pelas regiões flexíveis nem os rasters
+        layer = work.layer
+        if layer.shape == [] or work.cached:
+            return
+        layer.make_perimeter()
+        self._continuous_infill(work)
+
+    def _continuous_infill(self, work: "_LayerWork"):
+        # preenchimento ordenado a partir do last_loop, no primeiro ângulo ou no de menor custo entre os candidatos
+        layer = work.layer
+        if self.angle_search is None:
+            return self._infill_method.generate_continuous_infill(layer,
+                                                                  self.process.raster_gap,
+                                                                  self.process.infill_angle[0],
+                                                                  self.process.best_path,
+                                                                  layer.perimeter_paths,
+                                                                  self.process.threshold_walk_around)
+        trial = self.angle_search.choose(work.height, self.process.infill_method, layer, self.last_loop,
+                                         self.process.raster_gap, self.process.best_path,
+                                         self.process.threshold_walk_around, layer.raw_infill)
+        trial.apply(layer)
+        self.last_loop = trial.last_loop
+        return trial.infill_paths
+
+    def _layer_execution(self) -> str:
+        # "serial", "process" (pool de processos, layer_workers) ou "thread" (pipeline de estágios em threads);
+        # se não definido, "process" quando layer_workers > 1
+        execution = self.process.layer_execution
+        if not execution:
+            execution = "process" if self.process.layer_workers > 1 else "serial"
+        if execution not in ("serial", "process", "thread"):
+            raise ValueError("unknown layer execution: {}".format(execution))
+        self.layer_pipeline = None
+        return execution
+
+    def _stage_offsets(self, work: "_LayerWork") -> "_LayerWork":
+        # buffers das seções da camada, calculados juntos para o perímetro, a borda do preenchimento e a saia
+        offsets = LayerOffsets(work.section)
+        # para cada altura, é criado um novo objeto "Layer", que recebe os parãmetros referentes ao perímetro fornecidos pelo arquivo yml, e atribuído a "layer" que é referente a cada camada
+        layer = ContinuousLayer(work.section,
+                                self.process.perimeter_num,
+                                self.process.perimeter_gap,
+                                self.process.external_adjust,
+                                self.process.overlap,
+                                flex_print_instance=self,
+                                offsets=offsets)
+        layer.toolpath = LayerToolpath(self.layer_thicknesses.get(work.height))
+        work.layer = layer
+        if self._skirt is None:
+            # lógica de construção da saia em volta da primeira camada da peça
+            # cria uma instância "skirt" da classe "Layer" que recebe os parâmetros da saia fornecidos pelo arquivo yml
+            skirt = ContinuousLayer(work.section,
+                                    self.process.skirt_num,
+                                    self.process.skirt_gap,
+                                    - self.process.skirt_distance - self.process.skirt_gap * self.process.skirt_num,  # noqa: E501
                                     self.process.overlap,
-                                    flex_print_instance=self)
-            # Se o atributo shape do objeto layer for uma lista vazia, o objeto layer é adicionado ao dicionário "layers" com a chave "height" e o loop continua para a próxima iteração.
-            if layer.shape == []:
-                self.layers[height] = layer
+                                    flex_print_instance=self,
+                                    offsets=offsets)
+            # a saia usa a seção da primeira camada: suas distâncias entram no mesmo lote da camada
+            offsets.request(skirt.offset_distances() + layer.offset_distances())
+            # utiliza o método da classe "Layer" para criação do perímetro formado pela saia
+            skirt.make_perimeter()
+            self._skirt = skirt
+
+        # camadas vazias só são guardadas no dicionário "layers"
+        if layer.shape == []:
+            return work
+        if self._early_cache_lookup and self._cache_lookup(work):
+            return work
+        if work.prepared is not None:
+            # só a ordenação a partir do last_loop fica para o estágio "split"
+            layer.perimeter_rings, layer.infill_border, layer.raw_infill, _ = work.prepared
+            return work
+        # anéis do perímetro e limites do preenchimento da camada atual, ainda sem ordem
+        layer.make_perimeter_rings()
+        layer.make_infill_border()
+        return work
+
+    def _cache_lookup(self, work: "_LayerWork") -> bool:
+        # camada com as mesmas seções e o mesmo ponto de entrada já gerada: copiada do cache, com o last_loop de saída
+        if self.layer_cache is None:
+            return False
+        entry = self.last_loop
+        # a espessura da camada muda a extrusão dos rasters
+        params = self._layer_params_key + (self.layer_thicknesses.get(work.height), )
+        work.cache_key = self.layer_cache.make_key(work.section, work.flex_section, entry, params)
+        cached = self.layer_cache.get(work.cache_key)
+        if cached is None:
+            return False
+        work.layer, self.last_loop, split = cached
+        work.set_split(split)
+        work.cached = True
+        self.loop_states[work.height] = (entry, self.last_loop)
+        return True
+
+    def _stage_infill(self, work: "_LayerWork") -> "_LayerWork":
+        if work.layer.shape == [] or work.cached:
+            return work
+        # define a região flexível na camada atual baseado nos planos que compêm cada camada desta região já definida na função "slice"
+        if work.prepared is not None:  # já calculada no pool
+            work.flex_regions_gapped = work.prepared[3]
+            return work
+        # caminhos do preenchimento antes da ordenação
+        self._infill_method.prepare_infill(work.layer, self.process.raster_gap, self.process.infill_angle[0])
+        # em caso de "True" define a região flexível com gaps
+        if self.process.horizontal_gap_flex_infill:
+            work.flex_regions_gapped = create_gaps(work.flex_section,
+                                                   self.process.horizontal_num_gap,
+                                                   self.process.horizontal_perc_gap,
+                                                   self.process.orientation_gap)
+
+        # em caso de "False", não existe gap, apenas as regiões flexíveis
+        else:
+            work.flex_regions_gapped = work.flex_section
+        return work
+
+    def _stage_split(self, work: "_LayerWork") -> "_LayerWork":
+        layer = work.layer
+        # Se o atributo shape do objeto layer for uma lista vazia, a camada segue direto para o dicionário "layers"
+        if layer.shape == [] or work.cached:
+            return work
+        entry = self.last_loop
+        if work.cache_key is None and self._cache_lookup(work):
+            return work
+
+        # utiliza o método da classe "Layer" para criação do perímetro da camada atual
+
+        layer.make_perimeter()
+        # print("Layer ", i, "\nLast Perimeter Loop: ", self.last_loop, "\n")
+
+        flex_regions = work.flex_section
+        # Se "flex_regions" não for uma lista, ele é convertido em uma lista
+        if not type(flex_regions) == list:  # noqa: E721
+            flex_regions = list(flex_regions.geoms)
+        work.flex_regions = flex_regions
+        # regiões flexíveis preparadas uma vez (contornos, buffers, STRtree) para cortar e marcar todas as trajetórias
+        tagger = RegionTagger(flex_regions, work.flex_regions_gapped)
+
+        # ------ FIM DO PRE-PROCESSAMENTO DO PERIMETER_PATH -------
+        work.perimeter_paths = tagger.split(list(layer.perimeter_paths.geoms))
+        work.perimeter_tags = tagger.tag_perimeter(work.perimeter_paths)
+
+        # ------ COMEÇO DO PRE-PROCESSAMENTO DO INFILL_PATH -------
+        # Calcula o melhor caminho do preenchimento (perímetro para o preenchimento)
+        infill_paths = self._continuous_infill(work)
+
+        if not self.process.apply_walk_around:
+            work.infill_paths = tagger.split(list(infill_paths.geoms))
+            work.infill_masks = [0] * len(work.infill_paths)
+        else:
+            # com os desvios (walk around) as linhas vêm da camada, cortadas só pela última região, se houver
+            work.infill_paths, work.infill_masks = tagger.split_walk_around(layer.continuous_infill_w_sidewalk,
+                                                                            layer.mask_infill_with_waa)
+            layer.mask_sliced_region_walk_around = work.infill_masks
+        work.infill_tags = tagger.tag_infill(work.infill_paths)
+        # ------ FIM DO PRE-PROCESSAMENTO DO INFILL_PATH -------
+
+        if work.cache_key is not None:
+            # a trajetória é preenchida no estágio "rasters", a cópia de um acerto compartilha o mesmo toolpath
+            self.layer_cache.put(work.cache_key, layer, self.last_loop, work.split())
+        self.loop_states[work.height] = (entry, self.last_loop)
+        return work
+
+    def _stage_rasters(self, work: "_LayerWork") -> "_LayerWork":
+        if work.layer.shape == [] or work.cached:
+            return work
+        return self._add_rasters(work)
+
+    def _add_rasters(self, work: "_LayerWork") -> "_LayerWork":
+        layer = work.layer
+        i = 0  # índice da camada no laço original, nunca incrementado: saia e fluxo da primeira camada em todas
+
+        if i == 0:  # skirt
+            for path in self._skirt.perimeter_paths.geoms:
+
+                layer.toolpath.add(path, self.process.first_layer_flow, self.process.speed, PERIMETER)
+
+        for path, region in zip(work.perimeter_paths, work.perimeter_tags.tolist()):
+            if region != NORMAL:  # para a região flexível
+                flex_path, retract_path = retract(path, self.process.retract_ratio)  # noqa: E501
+                layer.toolpath.add(flex_path, self.process.flex_flow, self.process.flex_speed, FLEX)  # noqa: E501
+                layer.toolpath.add(retract_path, self.process.retract_flow, self.process.retract_speed, RETRACT)  # noqa: E501
+
+            elif i == 0:  # para a região normal, na primeira camada
+                # adiciona ao perímetro da primeira camada como deve ser o fluxo e a velocidade do raster
+                layer.toolpath.add(path, self.process.first_layer_flow, self.process.speed, PERIMETER)
+
+            else:  # para as demais camadas
+                # adiciona ao perímetro da camada como deve ser o fluxo e a velocidade do raster
+                layer.toolpath.add(path, self.process.flow, self.process.speed, PERIMETER)
+
+        # mask: '1' ou '0', desvios (walk around) percorridos sem extrusão
+        for path, region, mask in zip(work.infill_paths, work.infill_tags.tolist(), work.infill_masks):
+            if region == GAP:  # caminho no gap da região flexível, não é impresso
                 continue
-            # utiliza o método da classe "Layer" para criação do perímetro da camada atual
 
-            layer.make_perimeter()
-            # print("Layer ", i, "\nLast Perimeter Loop: ", self.last_loop, "\n")
-            # utiliza o método da classe "Layer" para criação dos limites do preenchimento da camada atual
-            layer.make_infill_border()
-
-            # define a região flexível na camada atual baseado nos planos que compêm cada camada desta região já definida na função "slice"
-            flex_regions = self.flex_planes.planes[height]
-
-            # em caso de "True" define a região flexível com gaps
-            if self.process.horizontal_gap_flex_infill:
-                flex_regions_gapped = create_gaps(flex_regions,
-                                                  self.process.horizontal_num_gap,
-                                                  self.process.horizontal_perc_gap,
-                                                  self.process.orientation_gap)
+            if region != NORMAL:  # se o caminho estiver na região flexivel
+                flex_path, retract_path = retract(path, self.process.retract_ratio)  # noqa: E501
+                layer.toolpath.add(flex_path, self.process.flex_flow, self.process.flex_speed, FLEX, mask)  # noqa: E501
+                layer.toolpath.add(retract_path, self.process.retract_flow, self.process.retract_speed, RETRACT, mask)  # noqa: E501
+                continue
 
-            # em caso de "False", não existe gap, apenas as regiões flexíveis
+            # para a região normal
+            # caminhos com máscara são os desvios (walk around), percorridos sem extrusão
+            kind = WALK_AROUND if mask == 1 else INFILL
+            if i == 0:  # para a primeira camada
+                # adiciona ao preenchimento da primeira camada como deve ser o fluxo e a velocidade do raster
+                layer.toolpath.add(path, self.process.first_layer_flow, self.process.speed, kind, mask)
             else:
-                flex_regions_gapped = flex_regions
-
-            # Se "flex_regions" não for uma lista, ele é convertido em uma lista
-            if not type(flex_regions) == list:  # noqa: E721
-                flex_regions = list(flex_regions.geoms)
-
-            if i == 0:  # skirt
-                for path in skirt.perimeter_paths.geoms:
-
-                    layer.perimeter.append(
-                        Raster(path, self.process.first_layer_flow, self.process.speed))
-
-            # ------ FIM DO PRE-PROCESSAMENTO DO PERIMETER_PATH -------
-            for path in split_by_regions(layer.perimeter_paths, flex_regions).geoms:
-                flex_path = False
-
-                for region in flex_regions:  # para a região flexível
-                    if path.within(region.buffer(0.01, join_style=2)):
-                        flex_path, retract_path = retract(path, self.process.retract_ratio)  # noqa: E501
-                        layer.perimeter.append(Raster(flex_path, self.process.flex_flow, self.process.flex_speed))  # noqa: E501
-                        layer.perimeter.append(Raster(retract_path, self.process.retract_flow, self.process.retract_speed))  # noqa: E501
-                        flex_path = True
-                        break
-
-                if not flex_path:  # para a região normal
-                    if i == 0:  # para a primeira camada
-                        # adiciona ao perímetro da primeira camada como deve ser o fluxo e a velocidade do raster
-                        layer.perimeter.append(
-                            Raster(path, self.process.first_layer_flow, self.process.speed))
-
-                    else:  # para as demais camadas
-                        # adiciona ao perímetro da camada como deve ser o fluxo e a velocidade do raster
-                        layer.perimeter.append(
-                            Raster(path, self.process.flow, self.process.speed))
-
-            # ------ COMEÇO DO PRE-PROCESSAMENTO DO INFILL_PATH -------
-                # Calcula o melhor caminho do preenchimento (perímetro para o preenchimento)
-
-            infill_paths = infill_method.generate_continuous_infill(layer,
-                                                                    self.process.raster_gap,
-                                                                    self.process.infill_angle[0],
-                                                                    self.process.best_path,
-                                                                    layer.perimeter_paths,
-                                                                    self.process.threshold_walk_around
-                                                                    )
-            
-
- 
-            infill_paths = split_by_regions(infill_paths, flex_regions, layer, self.process.apply_walk_around) 
-
-            # ------ FIM DO PRE-PROCESSAMENTO DO INFILL_PATH -------
-            for index, path in enumerate(infill_paths.geoms, start=0):
-                flex_path = False
-
-                if self.process.apply_walk_around:
-                    mask = layer.mask_sliced_region_walk_around[index] #this result will be '1' or '0'
-                else:
-                    mask = 0
-
-                for region in flex_regions_gapped.geoms:  # para a região flexível
-
-                    # se o caminho estiver na região flexivel
-                    if path.within(region.buffer(0.01, join_style=2)):
-                        flex_path, retract_path = retract(path, self.process.retract_ratio)  # noqa: E501
-                        layer.infill.append(Raster(flex_path, self.process.flex_flow, self.process.flex_speed, mask))  # noqa: E501
-                        layer.infill.append(Raster(retract_path, self.process.retract_flow, self.process.retract_speed, mask))  # noqa: E501  
-
-                        flex_path = True
-                        break
-
-                    else:  # its gap
-                        for flex in flex_regions:
-                            if path.within(flex.buffer(0.02, join_style=2)):
-                                flex_path = True
-
-                if not flex_path:  # para a região normal
-                    if i == 0:  # para a primeira camada
-                        # adiciona ao preenchimento da primeira camada como deve ser o fluxo e a velocidade do raster
-                        layer.infill.append(
-                            Raster(path, self.process.first_layer_flow, self.process.speed, mask))
-                    else:
-                        # adiciona ao preenchimento da camada como deve ser o fluxo e a velocidade do raster
-                        layer.infill.append(
-                            Raster(path, self.process.flow, self.process.speed, mask))
-
-            self.layers[height] = layer
+                # adiciona ao preenchimento da camada como deve ser o fluxo e a velocidade do raster
+                layer.toolpath.add(path, self.process.flow, self.process.speed, kind, mask)
+
+        return work
+
+    def _iter_prepared(self, sections, workers: int = 1):
+        """
+        Yields (height, model_section, flex_section, prepared), where prepared holds the parts of the layer that do
+        not depend on the previous one (see _prepare_layer), computed ahead in a process pool, or None when
+        workers is 1 or the section is empty. Only a few layers run ahead, so stream slicing stays bounded.
+        """
+        if workers <= 1:
+            for height, section, flex_section in sections:
+                yield height, section, flex_section, None
+            return
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        config = {"perimeter_num": self.process.perimeter_num,
+                  "perimeter_gap": self.process.perimeter_gap,
+                  "external_adjust": self.process.external_adjust,
+                  "overlap": self.process.overlap,
+                  "infill_method": self.process.infill_method,
+                  "raster_gap": self.process.raster_gap,
+                  "infill_angle": self.process.infill_angle[0],
+                  "horizontal_gap": (self.process.horizontal_num_gap, self.process.horizontal_perc_gap,
+                                     self.process.orientation_gap)
+                  if self.process.horizontal_gap_flex_infill else None}
+        shared = self.process.shared_memory_transport
+        if shared:
+            start_transport()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_layer_worker,
+                                 initargs=(config, )) as pool:
+            pending = deque()
+
+            def submit(section, flex_section):
+                # seções vazias ([]) não são geometrias e seguem pelo pickle
+                if shared and section != [] and flex_section != []:
+                    handle = share_geometries({"sections": [section, flex_section]})
+                    return handle, pool.submit(_prepare_layer_shared, handle)
+                return None, pool.submit(_prepare_layer, section, flex_section)
+
+            def result(handle, future):
+                try:
+                    prepared = future.result()
+                finally:
+                    if handle is not None:
+                        release(handle)
+                if isinstance(prepared, SharedHandle):
+                    try:
+                        groups = read_geometries(prepared)
+                    finally:
+                        release(prepared)
+                    prepared = (groups["rings"], groups["border"][0], groups["infill"][0] if "infill" in groups
+                                else None, groups["gapped"][0])
+                return prepared
+
+            # blocos das camadas ainda na fila liberados mesmo se um estágio falhar ou o gerador for fechado antes
+            try:
+                for height, section, flex_section in sections:
+                    pending.append((height, section, flex_section, *submit(section, flex_section)))
+                    if len(pending) >= 2 * workers:
+                        height, section, flex_section, handle, future = pending.popleft()
+                        yield height, section, flex_section, result(handle, future)
+                while pending:
+                    height, section, flex_section, handle, future = pending.popleft()
+                    yield height, section, flex_section, result(handle, future)
+            finally:
+                discard([item[4] for item in pending], [item[3] for item in pending])
+
+    def _layer_params(self) -> tuple:
+        # parâmetros que alteram a geometria, o fluxo ou a velocidade das trajetórias de uma camada
+        names = ("perimeter_num", "perimeter_gap", "external_adjust", "overlap", "raster_gap", "infill_angle",
+                 "best_path", "threshold_walk_around", "apply_walk_around", "horizontal_gap_flex_infill",
+                 "horizontal_num_gap", "horizontal_perc_gap", "orientation_gap", "first_layer_flow", "flow",
+                 "speed", "flex_flow", "flex_speed", "retract_flow", "retract_speed", "retract_ratio",
+                 "skirt_distance", "skirt_num", "skirt_gap", "infill_angle_search", "angle_cost")
+        return tuple(getattr(self.process, name) for name in names) + (self.process.infill_method.__name__, )
             
     def export_gcode(self, filename):
         if self.process.verbose is True:  # linha de verificação fornecida dentro das configurações do próprio arquivo yml
             # mensagem quando executa essa função do programa
             print("exporting gcode to {}".format(filename))
 
-        # cria uma instância "gcode_exporter" da classe "GcodeExporter" que recebe os parãmetros referentes ao script cabeçalho inicial e final do modelo da impressora utilizada fornecido pelo arquivo yml
-        gcode_exporter = self.process.gcode_exporter(self.process.travel_speed, self.process.retraction, start_script=self.process.start_script,
-                                                     end_script=self.process.end_script)
+        gcode_exporter = self._gcode_exporter()
         # utiliza o método "make_gcode" da classe "GcodeExporter" para gerar o gcode de todas as camadas da peça 3D
         gcode_exporter.make_gcode(self)
         # utiliza o método "export_gcode" da classe "GcodeExporter" para salvar todas as linhas do gcode gerado, fornecidas por uma lista, em um arquivo com o nome fornecido pelo usuário
         gcode_exporter.export_gcode(filename)
+
+    def _gcode_exporter(self):
+        # cria uma instância "gcode_exporter" da classe "GcodeExporter" que recebe os parãmetros referentes ao script cabeçalho inicial e final do modelo da impressora utilizada fornecido pelo arquivo yml
+        return self.process.gcode_exporter(self.process.travel_speed, self.process.retraction, start_script=self.process.start_script,
+                                           end_script=self.process.end_script)
+
+
+def _same_loop(a, b) -> bool:
+    # last_loop é [] antes da primeira camada e um LineString depois
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and a == b
+    return a.equals_exact(b, 0)
+
+
+class LazyLayers(Mapping):
+    """
+    Layers of a FlexPrint (height -> ContinuousLayer) generated on access and memoized.
+
+    A layer starts where the previous one ended (last_loop), so reading a layer walks the layers below it from the
+    highest one whose entry state is already known, computing for each only what moves last_loop forward.
+    """
+
+    def __init__(self, printable: "FlexPrint"):
+        self.printable = printable
+        self._layers: dict = {}  # height -> generated layer
+        self._entries: dict = {}  # layer index -> last_loop when the layer starts
+        self._index: Optional[dict] = None  # height -> layer index
+
+    def __getitem__(self, height):
+        if height not in self._layers:
+            self._generate(self._heights_index()[height])
+        return self._layers[height]
+
+    def __iter__(self):
+        return iter(self.printable.heights)
+
+    def __len__(self):
+        return len(self.printable.heights)
+
+    def _heights_index(self) -> dict:
+        if self._index is None:
+            self._index = {height: k for k, height in enumerate(self.printable.heights)}
+        return self._index
+
+    def _work(self, k: int) -> "_LayerWork":
+        height = self.printable.heights[k]
+        work = _LayerWork(height, *self.printable.section_at(height))
+        self.printable._stage_offsets(work)
+        return work
+
+    def _generate(self, k: int):
+        printable = self.printable
+        # as camadas geradas por make_layers e o estado delas continuam como estavam
+        state = printable.last_loop, printable.layers, printable.loop_states
+        try:
+            if not self._entries:
+                printable._start_layers()
+                self._work(0)  # a saia, feita com a primeira camada, define o ponto de entrada inicial
+                self._entries[0] = printable.last_loop
+            start = max(j for j in self._entries if j <= k)
+            for j in range(start, k):
+                printable.last_loop = self._entries[j]
+                printable._advance_last_loop(self._work(j))
+                self._entries[j + 1] = printable.last_loop
+            printable.last_loop = self._entries[k]
+            work = self._work(k)
+            for stage in (printable._stage_infill, printable._stage_split, printable._stage_rasters):
+                work = stage(work)
+            self._entries[k + 1] = printable.last_loop
+            self._layers[work.height] = work.layer
+        finally:
+            printable.last_loop, printable.layers, printable.loop_states = state
+            if printable.angle_search is not None:
+                printable.angle_search.close()
+
+    def head_before(self, height) -> tuple:
+        """Nozzle position when the layer at height starts: the end of the last raster of the layers below it"""
+        for k in range(self._heights_index()[height] - 1, -1, -1):
+            toolpath = self[self.printable.heights[k]].toolpath
+            if len(toolpath):
+                x, y = toolpath.coords[-1].tolist()
+                return x, y
+        return 0.0, 0.0
+
+
+class _LayerWork:
+    """A layer moving through the make_layers stages"""
+
+    __slots__ = ("height", "section", "flex_section", "prepared", "layer", "flex_regions", "flex_regions_gapped",
+                 "perimeter_paths", "perimeter_tags", "infill_paths", "infill_tags", "infill_masks", "cache_key",
+                 "cached")
+
+    def __init__(self, height, section, flex_section, prepared=None):
+        self.height = height
+        self.section = section
+        self.flex_section = flex_section
+        self.prepared = prepared  # output of _prepare_layer, or None
+        self.layer = None
+        self.flex_regions = None
+        self.flex_regions_gapped = None
+        self.perimeter_paths = None  # perimeter split by the flex regions (list of LineString)
+        self.perimeter_tags = None  # flex region of each perimeter path, or NORMAL (see RegionTagger)
+        self.infill_paths = None  # ordered infill split by the flex regions (list of LineString)
+        self.infill_tags = None  # flex region of each infill path, NORMAL or GAP
+        self.infill_masks = None  # walk-around mask of each infill path
+        self.cache_key = None
+        self.cached = False
+
+    _SPLIT = ("perimeter_paths", "perimeter_tags", "infill_paths", "infill_tags", "infill_masks")
+
+    def split(self) -> tuple:
+        """Paths split by the flex regions, with their tags and masks: everything the rasters stage reads"""
+        return tuple(getattr(self, name) for name in self._SPLIT)
+
+    def set_split(self, split: Optional[tuple]):
+        if split is not None:
+            for name, value in zip(self._SPLIT, split):
+                setattr(self, name, value)
+
+
+_layer_config: Optional[dict] = None  # parameters of the layers, set once per worker process
+
+
+def _init_layer_worker(config: dict):
+    global _layer_config
+    _layer_config = config
+
+
+def _prepare_layer(section, flex_section):
+    """
+    Computes the parts of a layer that do not depend on the previous layer: perimeter rings, infill border, infill
+    paths before ordering and the gapped flex regions. Returns None for an empty section. Errors reach the parent
+    through the future, as the serial path would raise them.
+    """
+    config = _layer_config
+    if section == []:
+        return None
+    layer = ContinuousLayer(section, config["perimeter_num"], config["perimeter_gap"], config["external_adjust"],
+                            config["overlap"], flex_print_instance=None)
+    layer.make_perimeter_rings()
+    layer.make_infill_border()
+    config["infill_method"](flex_print_instance=None).prepare_infill(layer, config["raster_gap"],
+                                                                     config["infill_angle"])
+    if config["horizontal_gap"] is not None:
+        flex_regions_gapped = create_gaps(flex_section, *config["horizontal_gap"])
+    else:
+        flex_regions_gapped = flex_section
+    return layer.perimeter_rings, layer.infill_border, layer.raw_infill, flex_regions_gapped
+
+
+def _prepare_layer_shared(handle: SharedHandle) -> Optional[SharedHandle]:
+    """_prepare_layer with the sections and the result in shared memory blocks"""
+    prepared = _prepare_layer(*read_geometries(handle)["sections"])
+    if prepared is None:
+        return None
+    rings, border, raw_infill, flex_regions_gapped = prepared
+    groups = {"rings": rings, "border": [border], "gapped": [flex_regions_gapped]}
+    if raw_infill is not None:
+        groups["infill"] = [raw_infill]
+    return share_geometries(groups)
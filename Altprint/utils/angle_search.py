@@ -0,0 +1,129 @@
+import numpy as np
+
+# busca do ângulo de preenchimento por camada: o preenchimento de cada ângulo candidato é gerado e ordenado a partir do
+# mesmo ponto de entrada (last_loop), em processos separados se houver workers, e a camada fica com o ângulo de menor
+# custo (deslocamento sem extrusão ou tempo estimado). Os custos de todos os candidatos ficam guardados por camada,
+# para reduzir o conjunto de ângulos depois
+
+COSTS = ("travel", "time")
+
+
+class AngleTrial:
+    """Stand-in layer to order the infill of one candidate angle without touching the real layer"""
+
+    def __init__(self, infill_border, entry, raw_infill=None):
+        self.infill_border = infill_border
+        self.raw_infill = raw_infill
+        # o generate_continuous_infill lê e atualiza o last_loop em layer.flex_print_ref
+        self.flex_print_ref = self
+        self.last_loop = entry
+        self.mask_walk_around = []
+        self.mask_infill_with_waa = []
+        self.continuous_infill_w_sidewalk = []
+        self.infill_paths = None
+
+    def apply(self, layer):
+        """Copies the infill results of the trial to the real layer"""
+        layer.raw_infill = self.raw_infill
+        layer.mask_walk_around = self.mask_walk_around
+        layer.mask_infill_with_waa = self.mask_infill_with_waa
+        layer.continuous_infill_w_sidewalk = self.continuous_infill_w_sidewalk
+
+
+def run_trial(infill_method, infill_border, entry, raw_infill, angle, gap, best_path, sidewalk,
+              thr_walk_around) -> AngleTrial:
+    """Generates and orders the infill of a layer for one angle, starting from entry (last_loop)"""
+    trial = AngleTrial(infill_border, entry, raw_infill)
+    method = infill_method(flex_print_instance=trial)
+    trial.infill_paths = method.generate_continuous_infill(trial, gap, angle, best_path, sidewalk, thr_walk_around)
+    return trial
+
+
+def travel_length(entry, paths) -> float:
+    """Length of the moves without extrusion: from the end of entry to the first path and between paths"""
+    if not len(paths.geoms):
+        return 0.0
+    starts = np.array([path.coords[0][:2] for path in paths.geoms])
+    ends = np.array([path.coords[-1][:2] for path in paths.geoms])
+    if isinstance(entry, list):  # antes da primeira camada não há ponto de entrada
+        previous = ends[:-1]
+        starts = starts[1:]
+    else:
+        previous = np.vstack((entry.coords[-1][:2], ends[:-1]))
+    return float(np.sqrt(((starts - previous)**2).sum(axis=1)).sum())
+
+
+class AngleSearch:
+    """Chooses the infill angle of each layer among candidates, by ordered travel length or estimated time"""
+
+    def __init__(self, angles, cost: str = "travel", workers: int = 1, speed: float = 1, travel_speed: float = 1):
+        """
+        ARGS:
+        angles: candidate angles in degrees (list of float)
+        cost: "travel" (length of the moves without extrusion) or "time" (infill time at speed plus moves at
+        travel_speed)
+        workers: processes evaluating the candidates of a layer in parallel (int)
+        """
+        if cost not in COSTS:
+            raise ValueError("unknown angle cost: {}".format(cost))
+        self.angles = list(angles)
+        self.cost = cost
+        self.workers = workers
+        self.speed = speed
+        self.travel_speed = travel_speed
+        self.costs: dict = {}  # layer height -> {angle: cost}
+        self.chosen: dict = {}  # layer height -> angle
+        self._pool = None
+
+    def _cost(self, entry, paths) -> float:
+        travel = travel_length(entry, paths)
+        if self.cost == "travel":
+            return travel
+        return paths.length/self.speed + travel/self.travel_speed
+
+    def choose(self, height, infill_method, layer, entry, gap, best_path, thr_walk_around,
+               first_raw_infill=None) -> AngleTrial:
+        """
+        Orders the infill of a layer for every candidate angle and keeps the cheapest one (the first on a tie).
+
+        ARGS:
+        first_raw_infill: infill before ordering already computed for the first angle, if any
+
+        RETURNS:
+        AngleTrial of the chosen angle
+        """
+        args = [(infill_method, layer.infill_border, entry, first_raw_infill if k == 0 else None, angle, gap,
+                 best_path, layer.perimeter_paths, thr_walk_around) for k, angle in enumerate(self.angles)]
+        if self.workers > 1 and len(args) > 1:
+            trials = list(self._executor().map(run_trial, *zip(*args)))
+        else:
+            trials = [run_trial(*a) for a in args]
+        costs = [self._cost(entry, trial.infill_paths) for trial in trials]
+        best = int(np.argmin(costs))
+        self.costs[height] = dict(zip(self.angles, costs))
+        self.chosen[height] = self.angles[best]
+        return trials[best]
+
+    def _executor(self):
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def close(self):
+        """Shuts down the worker processes, if any"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def report(self) -> str:
+        """Per candidate angle: layers where it was chosen and its mean cost over all layers"""
+        lines = ["infill angle search ({}):".format(self.cost)]
+        for angle in self.angles:
+            costs = [layer_costs[angle] for layer_costs in self.costs.values()]
+            chosen = sum(1 for a in self.chosen.values() if a == angle)
+            mean = sum(costs)/len(costs) if costs else 0.0
+            lines.append("  {:>8}: chosen in {} of {} layers, mean cost {:.2f}".format(angle, chosen, len(costs),
+                                                                                     mean))
+        return "\n".join(lines)
+
@@ -0,0 +1,160 @@
+from shapely.geometry import MultiLineString, LineString
+from shapely.affinity import translate, rotate
+from shapely.prepared import prep
+import numpy as np
+from Altprint.utils.rectilinear_infill import RectilinearInfill
+
+# preenchimento por decomposição boustrophedon: a borda é dividida em células monótonas nos pontos críticos (onde um
+# trecho da linha de varredura se divide em dois ou dois se juntam), cada célula é preenchida por um único zigue-zague e
+# as células são encadeadas pelo grafo de adjacência, passando para uma célula vizinha de cima sempre que o zigue-zague
+# termina do lado em que ela começa. Sobram poucos caminhos separados, e a ordenação (best_path) e os saltos entre
+# caminhos diminuem junto
+
+
+def scanline_intervals(shape, gap) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Intervals of the scanlines y = j*gap inside a polygon (even-odd rule, each edge counted on [miny, maxy)).
+
+    RETURNS:
+    (j, x0, x1) of each interval, sorted by scanline and then by x
+    """
+    a, b = [], []
+    for ring in (shape.exterior, *shape.interiors):
+        coords = np.asarray(ring.coords)[:, :2]
+        a.append(coords[:-1])
+        b.append(coords[1:])
+    a, b = np.concatenate(a), np.concatenate(b)
+    a, b = a[a[:, 1] != b[:, 1]], b[a[:, 1] != b[:, 1]]
+    miny, maxy = np.minimum(a[:, 1], b[:, 1]), np.maximum(a[:, 1], b[:, 1])
+    start = np.ceil(miny/gap).astype(np.int64)
+    counts = np.maximum(np.ceil(maxy/gap).astype(np.int64) - start, 0)
+    edge = np.repeat(np.arange(len(a)), counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    j = start[edge] + np.arange(int(counts.sum())) - offsets[edge]
+    y = j*gap
+    x = a[edge, 0] + (y - a[edge, 1])*(b[edge, 0] - a[edge, 0])/(b[edge, 1] - a[edge, 1])
+    order = np.lexsort((x, j))
+    j, x = j[order], x[order]
+    j, x0, x1 = j[0::2], x[0::2], x[1::2]
+    keep = x1 > x0  # vértices de mínimo local na própria linha de varredura dão trechos de tamanho zero
+    return j[keep], x0[keep], x1[keep]
+
+
+class BoustrophedonCells:
+    """Monotone cells of a polygon: runs of scanline intervals overlapping exactly one interval above and below"""
+
+    def __init__(self, shape, gap):
+        self.gap = gap
+        self.j, x0, x1 = scanline_intervals(shape, gap)
+        self.xs = (x0, x1)  # left and right end of each interval
+        n = len(self.j)
+        # trechos da linha de varredura seguinte que se sobrepõem a cada trecho: índices de up_lo a up_hi
+        self.up_lo = np.zeros(n, dtype=np.int64)
+        self.up_hi = np.zeros(n, dtype=np.int64)
+        down_count = np.zeros(n, dtype=np.int64)
+        bounds = np.searchsorted(self.j, np.arange(self.j[0], self.j[-1] + 2)) if n else np.zeros(1, dtype=np.int64)
+        for k in range(len(bounds) - 2):
+            a, b, c = bounds[k], bounds[k + 1], bounds[k + 2]
+            if a == b or b == c:
+                self.up_lo[a:b] = self.up_hi[a:b] = b
+                continue
+            self.up_lo[a:b] = b + np.searchsorted(x1[b:c], x0[a:b], side="right")
+            self.up_hi[a:b] = b + np.searchsorted(x0[b:c], x1[a:b], side="left")
+            down_count[b:c] = (np.searchsorted(x0[a:b], x1[b:c], side="left")
+                               - np.searchsorted(x1[a:b], x0[b:c], side="right"))
+        # a célula continua enquanto a ligação entre trechos vizinhos é 1 para 1
+        single = ((self.up_hi - self.up_lo) == 1)
+        single[single] = down_count[self.up_lo[single]] == 1
+        self.next = np.where(single, self.up_lo, -1)
+        heads = np.ones(n, dtype=bool)
+        heads[self.next[self.next >= 0]] = False
+        self.cells: list[list[int]] = []
+        self.cell_of: dict[int, int] = {}  # first interval of a cell -> cell
+        nxt = self.next.tolist()
+        for head in np.nonzero(heads)[0].tolist():
+            cell = [head]
+            while nxt[cell[-1]] >= 0:
+                cell.append(nxt[cell[-1]])
+            self.cell_of[head] = len(self.cells)
+            self.cells.append(cell)
+        # ligações dentro das células pelo lado esquerdo e direito que ficam dentro da borda (vetorizado); a folga só
+        # absorve o erro de ponto flutuante dos pontos calculados sobre as arestas
+        self.region = prep(shape.buffer(1e-6))
+        linked = np.nonzero(self.next >= 0)[0]
+        self.inside = (np.zeros(n, dtype=bool), np.zeros(n, dtype=bool))
+        for side in (0, 1):
+            lines = [LineString([(self.xs[side][i], self.j[i]*gap), (self.xs[side][k], self.j[k]*gap)])
+                     for i, k in zip(linked.tolist(), self.next[linked].tolist())]
+            if lines:
+                self.inside[side][linked] = [self.region.covers(line) for line in lines]
+
+    def _point(self, i, side):
+        return self.xs[side][i], self.j[i]*self.gap
+
+    def _neighbour(self, cell, side, visited):
+        # célula de cima ainda não visitada que começa do lado em que esta termina, ligada por dentro da região
+        top = self.cells[cell][-1]
+        for b in range(self.up_lo[top], self.up_hi[top]):
+            above = self.cell_of.get(b)
+            if above is None or visited[above]:
+                continue
+            if self.region.covers(LineString([self._point(top, side), self._point(b, side)])):
+                return above
+        return None
+
+    def paths(self) -> MultiLineString:
+        """Zig-zag of every cell, chained into the upper neighbour cells whenever possible"""
+        visited = [False] * len(self.cells)
+        paths = []
+        for first in range(len(self.cells)):
+            if visited[first]:
+                continue
+            # lado de início: o que faz a célula terminar do lado de uma vizinha de cima, se houver
+            side = 0
+            for start in (0, 1):
+                if self._neighbour(first, (start + len(self.cells[first])) % 2, visited) is not None:
+                    side = start
+                    break
+            path = []
+            cell = first
+            while cell is not None:
+                visited[cell] = True
+                for i in self.cells[cell]:
+                    path.append(self._point(i, side))
+                    path.append(self._point(i, 1 - side))
+                    side = 1 - side
+                    if self.next[i] >= 0 and not self.inside[side][i]:
+                        # a ligação com o próximo trecho sairia da região, o caminho recomeça
+                        paths.append(LineString(path))
+                        path = []
+                cell = self._neighbour(cell, side, visited)
+            if path:
+                paths.append(LineString(path))
+        return MultiLineString(paths)
+
+
+def boustrophedon_fill(shape, gap, angle=0) -> MultiLineString:
+    """
+    Zig-zag fill of a polygon through its boustrophedon cell decomposition.
+
+    ARGS:
+    shape: region to fill (Polygon)
+    gap: distance between rasters (float)
+    angle: raster angle in degrees (float)
+
+    RETURNS:
+    MultiLineString, one path per chain of cells
+    """
+    r_shape = rotate(shape, angle, origin=(0, 0))
+    tr_shape = translate(r_shape, -r_shape.bounds[0], -r_shape.bounds[1])
+    paths = BoustrophedonCells(tr_shape, gap).paths()
+    paths = translate(paths, r_shape.bounds[0], r_shape.bounds[1])
+    paths = rotate(paths, -angle, origin=(0, 0))
+    return paths
+
+
+class BoustrophedonInfill(RectilinearInfill):
+    """Rectilinear infill made of one zig-zag per monotone cell, with the same ordering as RectilinearInfill"""
+
+    def fill_border(self, border, gap, angle) -> MultiLineString:
+        return boustrophedon_fill(border, gap, angle)
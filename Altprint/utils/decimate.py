@@ -0,0 +1,177 @@
+import numpy as np
+
+# simplificação da malha antes do fatiamento: arestas cujo colapso desloca a superfície menos que a tolerância cordal
+# são colapsadas (erro quadrático em relação aos planos das faces originais). Reduz o custo do fatiamento de stl
+# exportados com resolução muito maior que a que o bico consegue reproduzir
+
+
+class DecimationReport:
+    """Summary of a decimation pass"""
+
+    def __init__(self, tolerance: float, triangles_before: int, triangles_after: int, max_deviation: float):
+        self.tolerance = tolerance
+        self.triangles_before = triangles_before
+        self.triangles_after = triangles_after
+        # largest distance from a moved vertex to the original faces around it
+        self.max_deviation = max_deviation
+
+    def reduction(self) -> float:
+        """Fraction of the triangles removed"""
+        if self.triangles_before == 0:
+            return 0.0
+        return 1 - self.triangles_after / self.triangles_before
+
+    def __str__(self):
+        return "decimation: {} -> {} triangles ({:.1f}% removed), max deviation {:.4f} mm (tolerance {} mm)".format(
+            self.triangles_before, self.triangles_after, 100 * self.reduction(), self.max_deviation, self.tolerance)
+
+
+def face_quadrics(vertices, faces):
+    """(m, 4, 4) fundamental error quadric of each face plane"""
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    normals = np.cross(b - a, c - a)
+    norm = np.linalg.norm(normals, axis=1)
+    normals = normals / np.where(norm > 0, norm, 1)[:, None]
+    planes = np.column_stack((normals, -np.einsum('ij,ij->i', normals, a)))
+    return planes[:, :, None] * planes[:, None, :]
+
+
+def _quadric_error(quadrics, points):
+    homogeneous = np.column_stack((points, np.ones(len(points))))
+    return np.einsum('ni,nij,nj->n', homogeneous, quadrics, homogeneous)
+
+
+def _face_normals(vertices, faces):
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    return np.cross(b - a, c - a)
+
+
+def _collapse_pass(vertices, faces, quadrics, tolerance, pinned):
+    """
+    Collapses an independent set of edges whose error stays below the tolerance.
+
+    Each collapse moves the removed vertex onto the surviving one (half-edge collapse), so the remaining vertices
+    are always original ones. Returns the updated faces, and the errors of the accepted collapses.
+    """
+    n_vertices = len(vertices)
+    edges = np.concatenate((faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]))
+    edges.sort(axis=1)
+    edge_ids, edge_use = np.unique(edges[:, 0] * n_vertices + edges[:, 1], return_counts=True)
+    edges = np.column_stack((edge_ids // n_vertices, edge_ids % n_vertices))
+    # vertices on an open boundary are kept, so holes and borders do not shrink
+    locked = pinned.copy()
+    locked[edges[edge_use == 1].ravel()] = True
+    edges = edges[edge_use == 2]
+    edges = edges[~(locked[edges[:, 0]] | locked[edges[:, 1]])]
+    if len(edges) == 0:
+        return faces, np.empty(0)
+
+    # cost of moving each end onto the other, the quadric sum measures the distance to the planes of both fans
+    edge_quadrics = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    cost_to_0 = _quadric_error(edge_quadrics, vertices[edges[:, 0]])
+    cost_to_1 = _quadric_error(edge_quadrics, vertices[edges[:, 1]])
+    to_0 = cost_to_0 <= cost_to_1
+    survivor = np.where(to_0, edges[:, 0], edges[:, 1])
+    removed = np.where(to_0, edges[:, 1], edges[:, 0])
+    cost = np.maximum(np.where(to_0, cost_to_0, cost_to_1), 0)
+    candidate = cost <= tolerance**2
+    survivor, removed, cost = survivor[candidate], removed[candidate], cost[candidate]
+    if len(cost) == 0:
+        return faces, np.empty(0)
+
+    # link condition: the ends of a collapsible edge share exactly the two opposite vertices, otherwise the
+    # collapse pinches the surface into a non-manifold fin
+    from scipy import sparse
+    adjacency = sparse.coo_matrix((np.ones(2 * len(edges), dtype=np.int32),
+                                   (edges.T.ravel(), edges[:, ::-1].T.ravel())),
+                                  shape=(n_vertices, n_vertices)).tocsr()
+    common = np.asarray(adjacency[survivor].multiply(adjacency[removed]).sum(axis=1)).ravel()
+    manifold = common == 2
+    survivor, removed, cost = survivor[manifold], removed[manifold], cost[manifold]
+    if len(cost) == 0:
+        return faces, np.empty(0)
+
+    # independent set: each vertex takes part in at most one collapse, the cheapest around it. Costs are ranked by
+    # coarse buckets shuffled within: strictly increasing costs chain the edges and leave few local minima per pass
+    bucket = np.floor(4 * cost / tolerance**2) if tolerance > 0 else np.zeros(len(cost))
+    shuffle = np.random.default_rng(0).permutation(len(cost))
+    rank = np.empty(len(cost), dtype=np.int64)
+    rank[np.lexsort((shuffle, bucket))] = np.arange(len(cost))
+    best = np.full(n_vertices, len(cost))
+    np.minimum.at(best, survivor, rank)
+    np.minimum.at(best, removed, rank)
+    chosen = (best[survivor] == rank) & (best[removed] == rank)
+
+    # faces touched by two removed vertices would be moved twice: keep only the cheapest collapse of such faces
+    removed_by = np.full(n_vertices, -1)
+    removed_by[removed[chosen]] = np.nonzero(chosen)[0]
+    face_owner = removed_by[faces]  # (m, 3) collapse moving each corner, -1 if it stays
+    shared = face_owner[(face_owner >= 0).sum(axis=1) > 1]
+    if len(shared):
+        owner_cost = np.where(shared >= 0, rank[np.maximum(shared, 0)], len(cost))
+        winner = shared[np.arange(len(shared)), np.argmin(owner_cost, axis=1)]
+        losers = shared[(shared >= 0) & (shared != winner[:, None])]
+        chosen[losers] = False
+    removed_by[:] = -1
+    removed_by[removed[chosen]] = np.nonzero(chosen)[0]
+
+    # faces around a removed vertex must not flip nor degenerate once it moves
+    remap = np.arange(n_vertices)
+    remap[removed[chosen]] = survivor[chosen]
+    face_owner = removed_by[faces]
+    moving = (face_owner >= 0).any(axis=1)
+    new_faces = remap[faces]
+    surviving = (new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2]) & \
+        (new_faces[:, 0] != new_faces[:, 2])
+    check = moving & surviving
+    before = _face_normals(vertices, faces[check])
+    after = _face_normals(vertices, new_faces[check])
+    flipped = np.einsum('ij,ij->i', before, after) <= \
+        0.2 * np.linalg.norm(before, axis=1) * np.linalg.norm(after, axis=1)
+    if flipped.any():
+        bad = face_owner[check][flipped]
+        chosen[np.unique(bad[bad >= 0])] = False
+        remap = np.arange(n_vertices)
+        remap[removed[chosen]] = survivor[chosen]
+        new_faces = remap[faces]
+        surviving = (new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2]) & \
+            (new_faces[:, 0] != new_faces[:, 2])
+
+    np.add.at(quadrics, survivor[chosen], quadrics[removed[chosen]])
+    return new_faces[surviving], cost[chosen]
+
+
+def decimate(triangles, tolerance: float, max_passes: int = 100):
+    """
+    Simplifies a triangle list by quadric-error edge collapses, within a chordal tolerance.
+
+    ARGS:
+    triangles: (n, 3, 3) triangle vertices (array)
+    tolerance: chordal tolerance in mm (float)
+    max_passes: limit of collapse passes (int)
+
+    RETURNS:
+    (simplified (m, 3, 3) triangles, DecimationReport)
+    """
+    triangles = np.asarray(triangles, dtype=np.float64)
+    vertices, faces = np.unique(triangles.reshape((-1, 3)), axis=0, return_inverse=True)
+    faces = faces.reshape((-1, 3))
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    # one vertex on each side of the bounding box stays, so the bounds (and the layer heights) do not change
+    pinned = np.zeros(len(vertices), dtype=bool)
+    if len(faces):
+        used = np.unique(faces)
+        pinned[used[np.argmin(vertices[used], axis=0)]] = True
+        pinned[used[np.argmax(vertices[used], axis=0)]] = True
+    quadrics = np.zeros((len(vertices), 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, faces[:, corner], face_quadrics(vertices, faces))
+
+    max_error = 0.0
+    for _ in range(max_passes):
+        faces, errors = _collapse_pass(vertices, faces, quadrics, tolerance, pinned)
+        if len(errors) == 0:
+            break
+        max_error = max(max_error, float(errors.max()))
+    report = DecimationReport(tolerance, len(triangles), len(faces), float(np.sqrt(max_error)))
+    return vertices[faces], report
@@ -0,0 +1,126 @@
+import numpy as np
+import shapely as sp
+
+# classificação das trajetórias de uma camada nas regiões flexíveis: as regiões são preparadas uma vez por camada
+# (contornos, buffers e STRtree) e todas as linhas são cortadas nos contornos e marcadas com a região que as contém,
+# com o mesmo resultado de split_by_regions seguido dos testes path.within(region.buffer(...)) feitos por caminho
+
+NORMAL = -1  # path outside every flex region
+GAP = -2  # infill path inside a horizontal gap of a flex region, not printed
+
+
+class RegionTagger:
+    """Flex regions of a layer, prepared once to cut and tag every path of the layer"""
+
+    def __init__(self, flex_regions, gapped_regions=None):
+        """
+        ARGS:
+        flex_regions: flex regions of the layer (list of Polygon)
+        gapped_regions: flex regions with the horizontal gaps (MultiPolygon), the flex regions if not given
+        """
+        self.regions = np.empty(len(flex_regions), dtype=object)
+        self.regions[:] = list(flex_regions)
+        if gapped_regions is None:
+            self.gapped = self.regions
+        else:
+            self.gapped = np.empty(len(gapped_regions.geoms), dtype=object)
+            self.gapped[:] = list(gapped_regions.geoms)
+        self.boundaries = sp.boundary(self.regions)
+        # buffers (join_style=2) dos testes de pertinência, calculados uma vez por camada e não por caminho
+        self.flex_buffers = sp.buffer(self.regions, 0.01, join_style=2)
+        self.gap_buffers = sp.buffer(self.regions, 0.02, join_style=2)
+        self.gapped_buffers = (self.flex_buffers if self.gapped is self.regions
+                               else sp.buffer(self.gapped, 0.01, join_style=2))
+        self._tree = sp.STRtree(self.boundaries)
+
+    def split(self, lines) -> list:
+        """
+        Cuts the lines at the boundary of every region, region by region, like split_by_regions.
+
+        ARGS:
+        lines: paths in printing order (list of LineString)
+
+        RETURNS:
+        List of LineString, the pieces of each line in order
+        """
+        return [piece for pieces in self._split(lines, range(len(self.regions))) for piece in pieces]
+
+    def split_walk_around(self, lines, masks) -> tuple[list, list]:
+        """
+        Cuts the lines of an infill with walk-around moves, like split_by_regions(walk_around=True): only the
+        boundary of the last region cuts the lines, each piece keeps the mask of its line. Without regions the lines
+        are kept whole.
+
+        RETURNS:
+        (pieces, mask of each piece)
+        """
+        pieces = self._split(lines, [len(self.regions) - 1] if len(self.regions) else [])
+        result, result_mask = [], []
+        for line_pieces, mask in zip(pieces, masks):
+            result.extend(line_pieces)
+            result_mask.extend([1 if mask == 1 else 0] * len(line_pieces))
+        return result, result_mask
+
+    def _split(self, lines, regions) -> list:
+        # peças de cada linha; uma linha só é testada contra os contornos cuja caixa envolvente ela cruza, as
+        # demais passam inteiras como no split do shapely
+        pieces = [[line] for line in lines]
+        if not pieces:
+            return pieces
+        geoms = np.empty(len(lines), dtype=object)
+        geoms[:] = list(lines)
+        line_idx, region_idx = self._tree.query(geoms)
+        for k in regions:
+            candidates = np.unique(line_idx[region_idx == k]).tolist()
+            if not candidates:
+                continue
+            owners = [i for i in candidates for _ in pieces[i]]
+            current = np.empty(len(owners), dtype=object)
+            current[:] = [piece for i in candidates for piece in pieces[i]]
+            boundary = self.boundaries[k]
+            relation = sp.relate(boundary, current)
+            if any(r[0] == "1" for r in relation):
+                raise ValueError("Input geometry segment overlaps with the splitter.")
+            crossing = np.array([r[0] == "0" or r[3] == "0" for r in relation], dtype=bool)
+            cut = np.empty(len(current), dtype=object)
+            cut[crossing] = sp.difference(current[crossing], boundary)
+            for i in candidates:
+                pieces[i] = []
+            for i, piece, crosses, parts in zip(owners, current, crossing, cut):
+                if not crosses:
+                    pieces[i].append(piece)
+                    continue
+                for part in sp.get_parts(parts):
+                    if part.geom_type == "LineString" and not part.is_empty:
+                        pieces[i].append(part)
+                    else:
+                        print("Empty linestring or not linestring")
+        return pieces
+
+    def tag_perimeter(self, paths) -> np.ndarray:
+        """Index of the first flex region containing each path (within its 0.01 buffer), NORMAL if none"""
+        return self._first_container(paths, self.flex_buffers)
+
+    def tag_infill(self, paths) -> np.ndarray:
+        """
+        Index of the first gapped flex region containing each infill path (within its 0.01 buffer). The paths
+        outside them but inside a flex region (within its 0.02 buffer) fall in a gap and get GAP, the others NORMAL.
+        """
+        tags = self._first_container(paths, self.gapped_buffers)
+        if len(self.gapped):  # o teste do gap só é feito dentro do laço das regiões com gaps
+            in_flex = self._first_container(paths, self.gap_buffers) != NORMAL
+            tags[(tags == NORMAL) & in_flex] = GAP
+        return tags
+
+    def _first_container(self, paths, buffers) -> np.ndarray:
+        tags = np.full(len(paths), NORMAL, dtype=np.int64)
+        if not len(paths) or not len(buffers):
+            return tags
+        geoms = np.empty(len(paths), dtype=object)
+        geoms[:] = list(paths)
+        # pares (região, caminho) com o caminho dentro da região, region.contains(path) == path.within(region)
+        region_idx, path_idx = sp.STRtree(geoms).query(buffers, predicate="contains")
+        first = np.full(len(paths), len(buffers), dtype=np.int64)
+        np.minimum.at(first, path_idx, region_idx)
+        tags[first < len(buffers)] = first[first < len(buffers)]
+        return tags
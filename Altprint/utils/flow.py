@@ -2,8 +2,10 @@
 # formado por duas funções
 
 import numpy as np
+from functools import lru_cache
 
 
+@lru_cache(maxsize=None)  # fator constante para os mesmos parâmetros, calculado uma vez por processo
 def calculate(w=0.48, h=0.2, df=1.75, adjust=1.14):  # 1.14
     # quanto de filamento é necessário extrudar pra fazer a área de um raster
     """
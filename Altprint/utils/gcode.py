@@ -1,8 +1,6 @@
-# importando classe que criará objetos que representam o lugar geométrico de uma linha (unidimensional)
-from shapely.geometry import LineString
 # classe abstrata que quero utilizar para criar outra classe que seja subclasse dela para criar objetos
 from Altprint.utils.base import BasePrint
-import numpy as np  # abreviação da lib numpy para usar seus recursos de forma simplificada
+import math
 
 
 class GcodeExporter:  # criando a classe que contém as funções para criação do código gcode da peça
@@ -95,30 +93,8 @@ class GcodeExporter:  # criando a classe que contém as funções para criação
 
         # Um loop é iniciado que percorre todos os itens no dicionário layers do objeto printable. Cada item no dicionário é um par de chave-valor, onde a chave é a coordenada z da camada e o valor é a camada em si.
         for z, layer in printable.layers.items():
-            for raster in layer.perimeter:  # Um loop interno é iniciado que percorre todos os rasters no perímetro da camada
-                x, y = raster.path.xy  # raster.path.xy está acessando o atributo "xy" do objeto "path" do objeto "raster". O atributo "xy" é uma tupla que contém duas listas: a primeira lista contém as coordenadas x de todos os pontos no caminho, e a segunda lista contém as coordenadas y correspondentes. Essas duas listas são então atribuídas às variáveis x e y, respectivamente
-                # as listas x e y são convertidas em arrays numpy para facilitar operações matemáticas com as coordenadas armazenadas
-                x, y = np.array(x), np.array(y)
-                # Se a distância entre a posição atual do bico da impressora e a primeira posição do raster for maior que min_jump, um comando de salto é adicionado à lista gcode_content. O comando de salto move o bico da impressora para a primeira posição do raster sem extrudir material
-                if LineString([(self.head_x, self.head_y), (x[0], y[0])]).length > self.min_jump:
-                    # noqa: E501
-                    self.gcode_content.append(
-                        self.jump(x[0], y[0], self.travel_speed_value, self.travel_retraction_value))  # MEXI AQUI PRA TRAVEL_SPEED NO YML****
-                # A posição atual do bico da impressora é atualizada para a última posição do raster
-                self.head_x, self.head_y = x[-1], y[-1]
-                # comando segment é adicionado à lista gcode_content. O comando segment move o bico da impressora ao longo do caminho do raster enquanto extruda material
-                self.gcode_content.append(self.segment(
-                    x, y, z, raster.extrusion, raster.speed))
-                # noqa: E501
-
-            for raster in layer.infill:  # mesmo processo é repetido para os rasters no preenchimento da camada
-                x, y = raster.path.xy
-                x, y = np.array(x), np.array(y)
-                if LineString([(self.head_x, self.head_y), (x[0], y[0])]).length > self.min_jump:  # noqa: E501
-                    self.gcode_content.append(
-                        self.jump(x[0], y[0], self.travel_speed_value, self.travel_retraction_value))
-                self.head_x, self.head_y = x[-1], y[-1]
-                self.gcode_content.append(self.segment(x, y, z, raster.extrusion, raster.speed))  # noqa: E501
+            # rasters da camada (perímetro e depois preenchimento), lidos direto das colunas do LayerToolpath
+            self.toolpath_gcode(layer.toolpath, z, self.gcode_content)
 
         # script cabeçalho final da impressor é adicionado à lista gcode_content
         self.gcode_content.append(end_script)
@@ -126,29 +102,43 @@ class GcodeExporter:  # criando a classe que contém as funções para criação
     # esse método é o mesmo que o anterior só que para gerar o gcode de uma única camada da peça
     def make_layer_gcode(self, layer):
         layer_gcode = []
-        for raster in layer.perimeter:
-            x, y = raster.path.xy
-            x, y = np.array(x), np.array(y)
-            if LineString([(self.head_x, self.head_y), (x[0], y[0])]).length > self.min_jump:  # noqa: E501
-                # Exemplo de Lazy, se tirar o "self.travel...", o arquivo compila se n usar a fç "make_layer_gcode"
-                layer_gcode.append(
-                    self.jump(x[0], y[0], self.travel_speed_value, self.travel_retraction_value))
-            self.head_x, self.head_y = x[-1], y[-1]
-            layer_gcode.append(self.segment(
-                x, y, None, raster.extrusion, raster.speed))
-
-        for raster in layer.infill:
-            x, y = raster.path.xy
-            x, y = np.array(x), np.array(y)
-            if LineString([(self.head_x, self.head_y), (x[0], y[0])]).length > self.min_jump:  # noqa: E501
-                layer_gcode.append(
-                    self.jump(x[0], y[0], self.travel_speed_value, self.travel_retraction_value))
-            self.head_x, self.head_y = x[-1], y[-1]
-            layer_gcode.append(self.segment(
-                x, y, None, raster.extrusion, raster.speed))
-
+        self.toolpath_gcode(layer.toolpath, None, layer_gcode)
         return layer_gcode
 
+    def toolpath_gcode(self, toolpath, z, gcode):
+        """
+        Appends the gcode of every raster of a LayerToolpath, jumping between rasters farther than min_jump.
+
+        ARGS:
+        toolpath: rasters of the layer (LayerToolpath)
+        z: layer height, None to omit the Z move (float)
+        gcode: list that receives the gcode blocks (list)
+        """
+        coords = toolpath.coords.tolist()
+        extrusion = toolpath.extrusion.tolist()
+        for start, length, speed in zip(toolpath.offsets.tolist(), toolpath.lengths.tolist(),
+                                        toolpath.speed.tolist()):
+            end = start + length
+            x0, y0 = coords[start]
+            # Se a distância entre a posição atual do bico da impressora e a primeira posição do raster for maior que min_jump, um comando de salto é adicionado
+            dx, dy = x0 - self.head_x, y0 - self.head_y
+            if math.sqrt(dx * dx + dy * dy) > self.min_jump:
+                gcode.append(self.jump(x0, y0, self.travel_speed_value, self.travel_retraction_value))
+            # A posição atual do bico da impressora é atualizada para a última posição do raster
+            self.head_x, self.head_y = coords[end - 1]
+            gcode.append(self.constant_speed_segment(coords[start:end], extrusion[start:end], speed, z))
+
+    def constant_speed_segment(self, coords, e, v, z) -> str:
+        """Same gcode as segment() for a raster printed at a single speed v"""
+        segment = ['; segment\nG92 E0.0000\nG1 F{0:.3f}\n'.format(v)]
+        if z is not None:
+            segment.append('G1 Z{0:.3f}\n'.format(z))
+        segment.append('G1 X{0:.3f} Y{1:.3f}\n'.format(*coords[0]))
+        line = 'G1 X{0:.3f} Y{1:.3f} E{2:.4f} \n'.format
+        segment.extend(line(x, y, ei) for (x, y), ei in zip(coords[1:], e[1:]))
+        segment.append('G92 E0.0000\n')
+        return "".join(segment)
+
     # método que escreve todas as linhas de gcode armazenados na lista "gcode_content" em um arquivo cujo nome é fornecido pelo usuário
     def export_gcode(self, filename):
         with open(filename, 'w') as f:  # arquivo com o nome filename é aberto para escrita ('w'). O arquivo aberto é referenciado pela variável f. O uso da declaração "with" garante que o arquivo será fechado corretamente após o término do bloco de código indentado abaixo dele
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 import numpy as np
 
 
@@ -8,9 +9,15 @@ class HeightMethod(ABC):
 
     @abstractmethod
     # método abstrato, como é decorado com @abstractmethod, qualquer classe concreta que herde de HeightMethod deve fornecer uma implementação para este método
-    def get_heights(self, bounds) -> list[float]:
+    # "model" é a malha fatiada (com o atributo triangles), usada pelos métodos que dependem da geometria da peça
+    def get_heights(self, bounds, model=None) -> list[float]:
         pass
 
+    # espessura de cada camada usada no cálculo do fluxo (flow.calculate); None mantém a altura padrão do cálculo
+    # em todas as camadas
+    def get_thicknesses(self, bounds, heights) -> Optional[list[float]]:
+        return None
+
 
 # definição da classe StandartHeightMethod, que herda de HeightMethod
 class StandartHeightMethod(HeightMethod):
@@ -21,7 +28,7 @@ class StandartHeightMethod(HeightMethod):
         self.layer_height = layer_height
 
     # método que calcula as alturas das camadas com base nos limites fornecidos e na altura da camada definida no construtor, recebe um parâmetro bounds e retorna uma lista de números de ponto flutuante
-    def get_heights(self, bounds) -> list[float]:
+    def get_heights(self, bounds, model=None) -> list[float]:
         # zi é definido como a coordenada Z do primeiro elemento de bounds (ou seja, o limite inferior no eixo z) mais a altura da camada
         zi = bounds[0][2] + self.layer_height
         # zf é definido como a coordenada Z do segundo elemento de bounds (ou seja, o limite superior no eixo z)
@@ -34,3 +41,81 @@ class StandartHeightMethod(HeightMethod):
         # valores em heights são arredondados para três casas decimais usando a função np.around
         heights = list(np.around(heights, decimals=3))
         return heights  # retorna a lista com as alturas de cada camada
+
+
+# definição da classe AdaptiveHeightMethod, que herda de HeightMethod
+class AdaptiveHeightMethod(HeightMethod):
+    """Layers adapted to the surface slope, limiting the cusp (stair-step) error"""
+
+    def __init__(self, min_height: float = 0.1, max_height: float = 0.3, cusp_error: float = 0.1):
+        self.min_height = min_height  # thinnest layer, used on shallow slopes
+        self.max_height = max_height  # thickest layer, used on near-vertical walls
+        # maximum cusp height: a layer of height h over a facet with normal n leaves a step of h*|n_z|
+        self.cusp_error = cusp_error
+
+    def get_heights(self, bounds, model=None) -> list[float]:
+        """
+        Calculates the layer heights from the facets crossing each layer.
+
+        ARGS:
+        bounds: model bounds ((xmin, ymin, zmin), (xmax, ymax, zmax))
+        model: sliced mesh, any object with the triangles (n, 3, 3) attribute
+
+        RETURNS:
+        List of layer heights (top of each layer)
+        """
+        if model is None:
+            raise ValueError("AdaptiveHeightMethod needs the sliced model to compute the layer heights")
+        triangles = np.asarray(model.triangles, dtype=np.float64)
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        norm = np.linalg.norm(normals, axis=1)
+        nz = np.abs(normals[:, 2]) / np.where(norm > 0, norm, 1)
+        # degenerate and horizontal facets leave no cusp, they do not limit the layer height
+        sloped = (norm > 0) & (nz < 1 - 1e-9)
+        with np.errstate(divide='ignore'):
+            limit = np.clip(self.cusp_error / nz[sloped], self.min_height, self.max_height)
+        zmin = triangles[sloped, :, 2].min(axis=1)
+        zmax = triangles[sloped, :, 2].max(axis=1)
+        order = np.argsort(zmin, kind='stable')
+        zmin_sorted = zmin[order]
+
+        z = bounds[0][2]
+        zf = bounds[1][2]
+        heights = []
+        active = np.empty(0, dtype=np.int64)
+        pointer = 0
+        while zf - z > 1e-9:
+            # facets crossing the thickest possible layer starting at z
+            end = np.searchsorted(zmin_sorted, z + self.max_height, side='left')
+            if end > pointer:
+                active = np.concatenate((active, order[pointer:end]))
+                pointer = end
+            active = active[zmax[active] > z]
+            h = limit[active].min() if len(active) else self.max_height
+            # a leftover thinner than the minimum height is merged into the last layer, or split in two layers
+            # when the merged layer would be thicker than the maximum height
+            # (com folga para o erro de ponto flutuante acumulado em z)
+            if zf - (z + h) < self.min_height - 1e-9:
+                h = zf - z if zf - z <= self.max_height + 1e-9 else (zf - z)/2
+            z = z + h
+            heights.append(z)
+        # mesmo ajuste do StandartHeightMethod para garantir que a última camada seja incluída na fatia
+        heights[-1] = heights[-1]-0.001
+        heights = list(np.around(heights, decimals=3))
+        return heights
+
+    def get_thicknesses(self, bounds, heights) -> list[float]:
+        """
+        Thickness of each layer, for the flow calculation: the distance from the top of the layer below (the
+        bottom of the model for the first one), without the 0.001 taken from the last height.
+
+        ARGS:
+        bounds: model bounds ((xmin, ymin, zmin), (xmax, ymax, zmax))
+        heights: layer heights returned by get_heights
+
+        RETURNS:
+        List of layer thicknesses, rounded like the heights
+        """
+        thicknesses = np.diff(np.concatenate(([bounds[0][2]], heights)))
+        thicknesses[-1] += 0.001
+        return list(np.around(thicknesses, decimals=3))
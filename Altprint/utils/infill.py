@@ -15,3 +15,8 @@ class InfillMethod(ABC):  # a base class for infill methods
     # takes a "Layer" object as an argument, the method should return a MultiLineString representing the infill paths for that layer
     def generate_continuous_infill(self, layer: Layer) -> MultiLineString:
         pass
+
+    # computes the part of the infill that does not depend on the previous layer (stored in layer.raw_infill), so it
+    # can run ahead in parallel; methods without such a split compute everything in generate_continuous_infill
+    def prepare_infill(self, layer: Layer, gap, angle):
+        pass
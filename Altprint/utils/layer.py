@@ -1,7 +1,11 @@
 from shapely.geometry import Polygon, MultiPolygon, LineString, MultiLineString
 from Altprint.utils.best_path import *
+from typing import Optional
 import numpy as np
+import shapely as sp
 from Altprint.utils.flow import calculate
+from Altprint.utils.toolpath import LayerToolpath
+from Altprint.utils.offsets import LayerOffsets
 
 # from itertools import permutations
 # from shapely.geometry import LineString, Point
@@ -15,6 +19,9 @@ from Altprint.utils.flow import calculate
 
 
 class Raster:  # Esta classe representa um caminho raster na impressão
+    """Extrusion path with the cumulative extrusion and the speed of each coordinate"""
+
+    __slots__ = ('path', 'speed', 'extrusion')  # muitos rasters por camada, sem __dict__ por instância
 
     # método que inicializa o raster com os seguintes parâmetros: path: Um LineString representando o caminho do bico da impressora, flow: O fator multiplicador de fluxo (calculado usando a função de cálculo), speed: A velocidade de impressão (valor escalar)
     def __init__(self, path: LineString, flow, speed, waa_mask=0):
@@ -27,27 +34,20 @@ class Raster:  # Esta classe representa um caminho raster na impressão
         else:
             _flow = flow
 
-
-        # "speed" é usada para criar uma matriz de velocidades (uma para cada ponto coordenado no caminho)
-        self.speed = np.ones(len(path.coords)) * speed
-        # A matriz de extrusão é inicializada com zeros (para acumular valores de extrusão)
-        self.extrusion = np.zeros(len(path.coords))
-        x, y = path.xy  # Extrai as coordenadas X e Y de "path"
-        # itera o laço a quantidade de vezes equivalente a quantiade de coordenadas armazenadas na array "path"
-        for i in range(1, len(path.coords)):
-            # distância entre a coordenada x atual e a anterior
-            dx = abs(x[i] - x[i - 1])
-            # distância entre a coordenada y atual e a anterior
-            dy = abs(y[i] - y[i - 1])
-            # array que armazena o valor da quantidade de filamento utilizada para cada "conjunto" de coordenadas XY que compõe a traetória do raster até o ponto atual
-            self.extrusion[i] = np.sqrt(
-                (dx**2) + (dy**2)) * _flow * calculate() + self.extrusion[i-1]
+        coords = sp.get_coordinates(path)  # (n, 2) coordenadas do caminho, numa única chamada
+        # velocidade constante: visão (somente leitura) de um único valor repetido para cada ponto do caminho
+        self.speed = np.broadcast_to(np.float64(speed), (len(coords),))
+        # distância entre cada par de coordenadas consecutivas
+        dx, dy = np.diff(coords[:, 0]), np.diff(coords[:, 1])
+        # quantidade de filamento acumulada até cada ponto, a soma acumulada segue a mesma ordem do laço ponto a ponto
+        self.extrusion = np.zeros(len(coords))
+        np.cumsum(np.sqrt((dx**2) + (dy**2)) * _flow * calculate(), out=self.extrusion[1:])
 
 
 class Layer:  # class represents a layer in a 3D printing process
     """Layer Object that stores layer internal and external shapes, also perimeters and infill path"""  # noqa: E501
 
-    def __init__(self, shape: MultiPolygon, perimeter_num, perimeter_gap, external_adjust, overlap):  # method that initializes the layer # noqa: E501
+    def __init__(self, shape: MultiPolygon, perimeter_num, perimeter_gap, external_adjust, overlap, offsets=None):  # method that initializes the layer # noqa: E501
         # A MultiPolygon representing the layer’s shape (both internal and external)
         self.shape = shape
         self.perimeter_num = perimeter_num  # The number of perimeters for this layer
@@ -58,22 +58,48 @@ class Layer:  # class represents a layer in a 3D printing process
         # A value indicating how much overlap there is between adjacent perimeters
         self.overlap = overlap
         self.perimeter_paths: List = []  # noqa: F821 #A list (initialized as empty) to store the paths of individual perimeters
-        self.perimeter: List = []  # noqa: F821 #list (initialized as empty) for additional perimeter-related information
-        self.infill: List = []  # noqa: F821 #list to store information related to infill paths
+        # rasters of the layer (skirt, perimeter, then infill), in printing order
+        self.toolpath = LayerToolpath()
         # A MultiPolygon (initialized as an empty MultiPolygon) representing the border of the infill area
         self.infill_border: MultiPolygon = MultiPolygon()
-
-    def make_perimeter(self):  # Este método constrói os caminhos de perímetro para uma camada erodindo a forma da camada e extraindo os segmentos de limite (externo) e furo (interno). Esses segmentos são armazenados no atributo perimeter_paths
-        """Generates the perimeter based on the layer process"""
+        # LayerOffsets with the buffers of the shape sections, may be shared with another layer of the same shape (skirt)
+        self.offsets = offsets
+        # unordered perimeter rings (LineStrings), computed by make_perimeter_rings
+        self.perimeter_rings: Optional[list] = None
+        # infill paths before ordering, computed by InfillMethod.prepare_infill
+        self.raw_infill: Optional[MultiLineString] = None
+
+    def perimeter_distances(self) -> list:
+        """Buffer distance of each perimeter ring"""
+        return [- self.perimeter_gap*(i) - self.external_adjust/2 for i in range(self.perimeter_num)]
+
+    def infill_border_distance(self) -> float:
+        """Buffer distance of the infill border"""
+        return - self.perimeter_gap * self.perimeter_num - self.external_adjust/2 + self.overlap
+
+    def offset_distances(self) -> list:
+        """Every buffer distance the layer needs (perimeter rings and infill border)"""
+        return self.perimeter_distances() + [self.infill_border_distance()]
+
+    def layer_offsets(self):
+        """LayerOffsets of the shape, with all the distances of the layer computed in one batch"""
+        if self.offsets is None:
+            self.offsets = LayerOffsets(self.shape)
+        self.offsets.request(self.offset_distances())
+        return self.offsets
+
+    def make_perimeter_rings(self) -> list:  # Este método constrói os anéis do perímetro erodindo a forma da camada e extraindo os segmentos de limite (externo) e furo (interno), sem ordená-los. Não depende da camada anterior
+        """Generates the unordered perimeter rings of the layer (stored in perimeter_rings)"""
 
         # empty list "perimeter_paths" to store the individual segments of the perimeter
         perimeter_paths = []
         # the loop iterates through each section (geometry) within the layer’s shape (which is a MultiPolygon)
-        for section in self.shape.geoms:
+        offsets = self.layer_offsets()
+        distances = self.perimeter_distances()
+        for j in range(len(self.shape.geoms)):
             for i in range(self.perimeter_num):  # the loop iterates number of perimeters
-                eroded_shape = section.buffer(- self.perimeter_gap*(i)
-                                              - self.external_adjust/2, join_style=2)  # Calculates an “eroded shape” by buffering the section with a negative distance
-                # The negative distance is determined by subtracting the product of self.perimeter_gap * i and self.external_adjust / 2. The join_style=2 argument specifies how the buffer should handle intersections
+                # “eroded shape”: the section buffered (join_style=2) by the negative distance - self.perimeter_gap * i - self.external_adjust / 2, taken from the batch of the layer
+                eroded_shape = offsets.get(distances[i])[j]
 
                 # If the eroded shape is empty (has no geometry), the loop breaks
                 if eroded_shape.is_empty:
@@ -93,8 +119,15 @@ class Layer:  # class represents a layer in a 3D printing process
                 for poly in polygons:
                     # Adds the exterior ring (boundary) as a LineString segment to perimeter_paths
                     perimeter_paths.append(LineString(poly.exterior))
+        self.perimeter_rings = perimeter_paths
+        return perimeter_paths
+
+    def make_perimeter(self):
+        """Generates the perimeter based on the layer process"""
+        if self.perimeter_rings is None:
+            self.make_perimeter_rings()
         # assigns the entire perimeter_paths list (composed of all the segments) to the self.perimeter_paths attribute (which is a MultiLineString)
-        self.perimeter_paths = MultiLineString(perimeter_paths)
+        self.perimeter_paths = MultiLineString(self.perimeter_rings)
 
     def make_infill_border(self):  # method constructs the infill border for a layer by eroding the layer’s shape and extracting the individual polygons that form the border. These polygons are stored in the infill_border attribute
         """Generates the infill border based on the layer process"""
@@ -102,11 +135,9 @@ class Layer:  # class represents a layer in a 3D printing process
         # empty list called infill_border_geoms to store the individual geometries (polygons) of the infill border
         infill_border_geoms = []
         # the loop iterates through each section (geometry) within the layer’s shape (which is a MultiPolygon)
-        for section in self.shape.geoms:
-            eroded_shape = section.buffer(- self.perimeter_gap
-                                          * self.perimeter_num
-                                          - self.external_adjust/2
-                                          + self.overlap, join_style=2)  # Calculates an “eroded shape” by buffering the section with a negative distance
+        borders = self.layer_offsets().get(self.infill_border_distance())
+        for j in range(len(self.shape.geoms)):
+            eroded_shape = borders[j]  # “eroded shape”: the section buffered by the negative infill border distance
             if not eroded_shape.is_empty:  # If the eroded shape is not empty
                 # If the eroded shape is a single Polygon, it appends it to the infill_border_geoms list
                 if type(eroded_shape) == Polygon:
@@ -122,9 +153,9 @@ class Layer:  # class represents a layer in a 3D printing process
 class ContinuousLayer(Layer):
     """Enhanced Layer class generating continuous paths for perimeter and infill"""
 
-    def __init__(self, shape: MultiPolygon, perimeter_num, perimeter_gap, external_adjust, overlap, flex_print_instance):
+    def __init__(self, shape: MultiPolygon, perimeter_num, perimeter_gap, external_adjust, overlap, flex_print_instance, offsets=None):
 
-        super().__init__(shape, perimeter_num, perimeter_gap, external_adjust, overlap)
+        super().__init__(shape, perimeter_num, perimeter_gap, external_adjust, overlap, offsets)
         self.continuous_perimeter_paths: List[LineString] = []
         self.continuous_infill_paths: List[LineString] = []
         self.flex_print_ref = flex_print_instance
@@ -136,29 +167,10 @@ class ContinuousLayer(Layer):
     def make_perimeter(self):
         """Generates the perimeter based on the layer process"""
 
-        perimeter_paths = []
-
-        for section in self.shape.geoms:
-            for i in range(self.perimeter_num):
-                eroded_shape = section.buffer(- self.perimeter_gap*(i)
-                                              - self.external_adjust/2, join_style=2)
-
-                if eroded_shape.is_empty:
-                    break
-
-                if type(eroded_shape) == Polygon:
-                    polygons = [eroded_shape]
-
-                elif type(eroded_shape) == MultiPolygon:
-                    polygons = list(eroded_shape.geoms)
-
-                for poly in polygons:
-                    for hole in poly.interiors:
-
-                        perimeter_paths.append(LineString(hole))
-                for poly in polygons:
-
-                    perimeter_paths.append(LineString(poly.exterior))
+        # anéis do perímetro (calculados aqui, ou antes em paralelo), ordenados a partir do fim da camada anterior
+        if self.perimeter_rings is None:
+            self.make_perimeter_rings()
+        perimeter_paths = list(self.perimeter_rings)
 
         # Rearrange for Continuous Path
 
@@ -189,11 +201,9 @@ class ContinuousLayer(Layer):
         # empty list called infill_border_geoms to store the individual geometries (polygons) of the infill border
         infill_border_geoms = []
         # the loop iterates through each section (geometry) within the layer’s shape (which is a MultiPolygon)
-        for section in self.shape.geoms:
-            eroded_shape = section.buffer(- self.perimeter_gap
-                                          * self.perimeter_num
-                                          - self.external_adjust/2
-                                          + self.overlap, join_style=2)  # Calculates an “eroded shape” by buffering the section with a negative distance
+        borders = self.layer_offsets().get(self.infill_border_distance())
+        for j in range(len(self.shape.geoms)):
+            eroded_shape = borders[j]  # “eroded shape”: the section buffered by the negative infill border distance
             if not eroded_shape.is_empty:  # If the eroded shape is not empty
                 # If the eroded shape is a single Polygon, it appends it to the infill_border_geoms list
                 if type(eroded_shape) == Polygon:
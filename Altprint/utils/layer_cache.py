@@ -0,0 +1,75 @@
+import copy
+import hashlib
+import shapely as sp
+
+# reaproveitamento de camadas entre alturas: peças prismáticas têm muitas camadas com a mesma seção do modelo e da
+# região flexível. A trajetória de uma camada só depende dessas seções, dos parâmetros de geometria e do ponto de
+# entrada (last_loop da camada anterior), então uma camada com a mesma chave é copiada em vez de recalculada. As
+# seções e o ponto de entrada são comparados exatamente (WKB), a camada copiada é a mesma que seria recalculada.
+# As seções de um prisma só diferem pelos vértices colineares deixados pelos triângulos laterais, que a simplificação
+# das seções (section_simplify_tolerance) remove
+
+
+def geometry_digest(geom) -> bytes:
+    """
+    Exact digest of a geometry: its WKB, so two geometries only share a digest if every vertex is the same, in the
+    same order.
+
+    ARGS:
+    geom: shapely geometry, or [] for no geometry
+
+    RETURNS:
+    sha256 digest (bytes)
+    """
+    if geom is None or isinstance(geom, list):
+        return hashlib.sha256(repr(geom).encode()).digest()
+    return hashlib.sha256(sp.to_wkb(geom, include_srid=False)).digest()
+
+
+class LayerCache:
+    """In-memory cache of generated layers, keyed by sections, parameters and entry point"""
+
+    def __init__(self):
+        self._entries: dict[str, tuple] = {}  # key -> (layer, exit last_loop, split paths)
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, section, flex_section, entry, params: tuple) -> str:
+        """
+        Builds the key of a layer.
+
+        ARGS:
+        section: model section (MultiPolygon)
+        flex_section: flex region section (MultiPolygon)
+        entry: last loop of the previous layer, where this layer starts (LineString or [])
+        params: every parameter that changes the layer geometry, flows and speeds (tuple)
+        """
+        sha = hashlib.sha256()
+        sha.update(geometry_digest(section))
+        sha.update(geometry_digest(flex_section))
+        sha.update(geometry_digest(entry))
+        sha.update(repr(params).encode())
+        return sha.hexdigest()
+
+    def get(self, key: str):
+        """Returns (copy of the cached layer, exit last_loop, split paths), or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        layer, exit_loop, split = entry
+        return copy.copy(layer), exit_loop, split
+
+    def put(self, key: str, layer, exit_loop, split=None):
+        """
+        ARGS:
+        split: paths of the layer split by the flex regions, with their tags and masks, so a copy can rebuild its
+        rasters without the layer that produced them (tuple)
+        """
+        self._entries[key] = (layer, exit_loop, split)
+
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        return "layer cache: {} hits, {} misses ({:.1f}% reused)".format(self.hits, self.misses, rate)
@@ -0,0 +1,38 @@
+import numpy as np
+import shapely as sp
+from shapely.geometry import MultiPolygon
+
+# offsets (buffers) das seções de uma camada: perímetros, borda do preenchimento e saia usam a mesma seção em
+# distâncias diferentes, que são calculadas juntas numa única chamada vetorizada do shapely e guardadas por camada
+
+
+class LayerOffsets:
+    """Mitred buffers of each section of a layer, computed in batches and cached by distance"""
+
+    def __init__(self, shape: MultiPolygon):
+        self.sections = np.empty(len(shape.geoms), dtype=object)
+        self.sections[:] = list(shape.geoms)
+        self._buffers: dict[float, np.ndarray] = {}  # distance -> buffer of each section
+
+    def request(self, distances):
+        """
+        Computes the buffers of every section at the distances not cached yet, in a single buffer call.
+
+        ARGS:
+        distances: buffer distances, negative erodes (list of float)
+        """
+        missing = list(dict.fromkeys(d for d in distances if d not in self._buffers))
+        if not missing or len(self.sections) == 0:
+            for d in missing:
+                self._buffers[d] = np.empty(0, dtype=object)
+            return
+        # (sections, distances) grid, same as section.buffer(d, join_style=2) for each pair
+        buffers = sp.buffer(self.sections[:, None], np.asarray(missing)[None, :], join_style=2)
+        for k, d in enumerate(missing):
+            self._buffers[d] = buffers[:, k]
+
+    def get(self, distance: float) -> np.ndarray:
+        """Buffer of each section at a distance"""
+        if distance not in self._buffers:
+            self.request([distance])
+        return self._buffers[distance]
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+
+# pipeline de threads: cada estágio roda numa thread própria e passa os itens ao próximo por uma fila limitada, na
+# mesma ordem em que chegaram. As operações do GEOS (buffer, split, within...) liberam o GIL no shapely 2, então
+# estágios de camadas diferentes avançam ao mesmo tempo sem o custo de serializar as geometrias entre processos
+
+_DONE = object()  # marks the end of the items in a queue
+
+
+class StageStats:
+    """Busy time and item count of a pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.busy = 0.0  # seconds spent running the stage (s)
+        self.items = 0
+
+
+class ThreadPipeline:
+    """Runs a sequence of stages on a stream of items, one thread per stage, connected by bounded queues"""
+
+    def __init__(self, stages, queue_size: int = 2):
+        """
+        ARGS:
+        stages: (name, function) pairs, each function takes the item of the previous stage and returns the next
+        queue_size: maximum number of items waiting between two stages (int)
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(name) for name, _ in stages]
+        self.wall = 0.0
+        self._error: list = []
+        self._stop = threading.Event()
+
+    def run(self, source):
+        """
+        Feeds the items of source through the stages and yields the results of the last stage, in order.
+        An exception raised by a stage stops the pipeline and is raised again here.
+        """
+        start = time.perf_counter()
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), daemon=True)]
+        for k, (_, function) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._work, args=(function, self.stats[k], queues[k],
+                                                                      queues[k + 1]), daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for q in queues:  # unblocks the threads waiting on a full queue
+                while not q.empty():
+                    q.get_nowait()
+            for thread in threads:
+                thread.join()
+            self.wall = time.perf_counter() - start
+        if self._error:
+            raise self._error[0]
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _feed(self, source, out: queue.Queue):
+        try:
+            for item in source:
+                if not self._put(out, item):
+                    return
+        except BaseException as error:
+            self._error.append(error)
+        self._put(out, _DONE)
+
+    def _work(self, function, stats: StageStats, inp: queue.Queue, out: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                item = inp.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE or self._error:
+                break
+            start = time.perf_counter()
+            try:
+                item = function(item)
+            except BaseException as error:
+                self._error.append(error)
+                break
+            stats.busy += time.perf_counter() - start
+            stats.items += 1
+            if not self._put(out, item):
+                return
+        self._put(out, _DONE)
+
+    def report(self) -> str:
+        """Busy time and utilization (busy / wall time) of each stage"""
+        lines = ["layer pipeline: {:.2f} s".format(self.wall)]
+        for stats in self.stats:
+            utilization = 100 * stats.busy / self.wall if self.wall else 0.0
+            lines.append("  {}: {} items, {:.2f} s busy ({:.0f}%)".format(stats.name, stats.items, stats.busy,
+                                                                         utilization))
+        return "\n".join(lines)
@@ -1,14 +1,13 @@
 from shapely.geometry import Polygon, MultiLineString, Point
-from shapely.plotting import plot_line, plot_points, plot_polygon
 from shapely.affinity import translate, rotate
 import numpy as np
 from Altprint.utils.infill import InfillMethod
 from Altprint.utils.layer import Layer
-from matplotlib import pyplot as plt
+from Altprint.utils.scanline_fill import scanline_fill
 
 from Altprint.utils.best_path import *
 
-import networkx as nx
+# networkx (e matplotlib, só usado para depurar o grafo) são importados apenas quando o best_path é usado
 
 # arquivo define como será feito o tipo/caminho do preenchimento (raster), cada área de cada camada tem suas colunas de preenchimento e de buracos além de definir a estratégia de preenchimento pela rotação e translação de segmentos
 
@@ -200,6 +199,7 @@ def get_rectilinear_path(cols, fill, used, gap):
     return MultiLineString(paths)
 
 
+# implementação de referência com as matrizes mascaradas, o RectilinearInfill usa scanline_fill (mesmo resultado)
 def rectilinear_fill(shape, gap, angle=0, thres=0):
     # Gira a forma original (shape) em um ângulo especificado (angle), o ponto de rotação é o ponto (0, 0) no plano
     r_shape = rotate(shape, angle, origin=(0, 0))
@@ -237,12 +237,16 @@ class RectilinearInfill(InfillMethod):
 
         self.flex_print_ref = flex_print_instance
 
+    # caminhos de uma borda de preenchimento (Polygon), as subclasses trocam só o padrão dos caminhos
+    def fill_border(self, border, gap, angle) -> MultiLineString:
+        return scanline_fill(border, gap, angle)
+
     # método que gera preenchimento, retorna um objeto MultiLineString, que representa várias linhas conectadas
     def generate_infill(self, layer: Layer, gap, angle) -> MultiLineString:
         infill = []  # armazenar os caminhos de preenchimento
         for border in layer.infill_border.geoms:  # Itera através das geometrias da borda de preenchimento da camada
-            # para cada borda, gera caminhos de preenchimento reticulado usando a função rectilinear_fill
-            paths = rectilinear_fill(border, gap, angle)
+            # para cada borda, gera caminhos de preenchimento reticulado usando o motor esparso (mesmo resultado da função rectilinear_fill)
+            paths = self.fill_border(border, gap, angle)
             # Adiciona os caminhos gerados à lista infill
             infill.extend(paths.geoms)
         # Retorna os caminhos de preenchimento como um objeto MultiLineString
@@ -253,15 +257,21 @@ class RectilinearInfill(InfillMethod):
 
         return multilinestring_infill
 
-    def generate_continuous_infill(self, layer: Layer, gap, angle, best_path_flag, sidewalk, thr_walk_around) -> MultiLineString:
+    # caminhos do preenchimento reticulado antes da ordenação, não dependem da camada anterior
+    def prepare_infill(self, layer: Layer, gap, angle):
         infill = []  # armazenar os caminhos de preenchimento
         for border in layer.infill_border.geoms:  # Itera através das geometrias da borda de preenchimento da camada
-            # para cada borda, gera caminhos de preenchimento reticulado usando a função rectilinear_fill
-            paths = rectilinear_fill(border, gap, angle)
+            # para cada borda, gera caminhos de preenchimento reticulado usando o motor esparso (mesmo resultado da função rectilinear_fill)
+            paths = self.fill_border(border, gap, angle)
             # Adiciona os caminhos gerados à lista infill
             infill.extend(paths.geoms)
         # Retorna os caminhos de preenchimento como um objeto MultiLineString
-        multilinestring_infill = MultiLineString(infill)
+        layer.raw_infill = MultiLineString(infill)
+
+    def generate_continuous_infill(self, layer: Layer, gap, angle, best_path_flag, sidewalk, thr_walk_around) -> MultiLineString:
+        if layer.raw_infill is None:
+            self.prepare_infill(layer, gap, angle)
+        multilinestring_infill = layer.raw_infill
 
         # ----- Processing BestPath -----
         perimeterBuffer = RawList_Points(layer.flex_print_ref.last_loop, makeTuple=True)
@@ -271,6 +281,7 @@ class RectilinearInfill(InfillMethod):
         ### ---------------------------------------------------###
         
         if best_path_flag:
+            import networkx as nx
             G = nx.Graph()
             number_node = 1
             edges_point = []
@@ -337,6 +348,7 @@ class RectilinearInfill(InfillMethod):
 
 
             # 4. Draw and display the graph
+            #from matplotlib import pyplot as plt
             #pos = nx.shell_layout(G) # positions for all nodes
             #nx.draw(G, pos, with_labels=True, node_color='lightblue', node_size=1000, edge_color='gray')
             #edge_labels = nx.get_edge_attributes(G, 'weight')
@@ -0,0 +1,198 @@
+from itertools import chain
+from shapely.geometry import MultiLineString
+from shapely.affinity import translate, rotate
+import numpy as np
+import shapely as sp
+
+# motor esparso do preenchimento reticulado: em vez das matrizes mascaradas (arestas x linhas de varredura) do
+# rectilinear_fill, guarda só as interseções reais de cada aresta com as linhas de varredura y = j*gap. A memória e o
+# tempo crescem com o número de interseções, e o resultado é o mesmo MultiLineString do rectilinear_fill: a ordem das
+# arestas produzida pelo sort_cols (que permuta linhas inteiras da matriz a cada linha de varredura) é reproduzida
+# por uma permutação das arestas, e a busca dos caminhos percorre as interseções na mesma ordem
+
+
+class ScanlineEdges:
+    """Intersections of the polygon edges with the scanlines, stored per edge"""
+
+    def __init__(self, gap: float, thres: float = 0):
+        self.gap = gap
+        self.thres = thres
+        self.starts: list[int] = []  # first scanline crossed by each edge
+        self.ends: list[int] = []  # scanline after the last one crossed
+        self.fills: list[int] = []  # fill flag of each edge, as in get_column
+        self.xs: list[np.ndarray] = []  # x of the intersection with each scanline from start to end
+
+    def add_ring(self, ring, hole: bool):
+        """Adds the edges of a ring (exterior or hole), ccw, with |dy| above the threshold"""
+        coords = ring.coords[::-1] if not ring.is_ccw else ring.coords
+        for i in range(len(coords) - 1):
+            a = coords[i]
+            b = coords[i + 1]
+            dy = b[1] - a[1]
+            if abs(dy) > self.thres:
+                self._add_edge(a, b, dy, hole)
+
+    def _add_edge(self, a, b, dy, hole):
+        # mesmas contas do get_column/x_from_y, para as mesmas coordenadas
+        maxy = max(a[1], b[1])
+        miny = min(a[1], b[1])
+        start = int(np.ceil(miny/self.gap))
+        end = int(np.floor(maxy/self.gap)+1)
+        ys = np.arange(start, end)*self.gap
+        dx = b[0]-a[0]
+        if dx == 0:
+            xs = np.ones(len(ys))*a[0]
+        else:
+            xs = (ys - a[1])*dx/dy + a[0]
+        self.starts.append(start)
+        self.ends.append(max(end, start))
+        self.xs.append(xs)
+        # preenchimento quando a aresta sobe no contorno externo ou desce num buraco
+        self.fills.append(0 if (dy > 0) != hole else 1)
+
+
+class ScanlineFill:
+    """Rectilinear paths of a set of scanline edges"""
+
+    def __init__(self, edges: ScanlineEdges, height: int):
+        self.gap = edges.gap
+        self.height = height
+        self.starts = np.array(edges.starts, dtype=np.int64)
+        self.ends = np.array(edges.ends, dtype=np.int64)
+        self.fills = np.array(edges.fills, dtype=np.int64)
+        lengths = self.ends - self.starts
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64) if len(lengths) else lengths
+        self.x = np.concatenate(edges.xs) if edges.xs else np.empty(0)
+        # arestas que cruzam cada linha de varredura, em ordem crescente de aresta
+        scan = np.repeat(self.starts - self.offsets, lengths) + np.arange(int(lengths.sum()))
+        edge = np.repeat(np.arange(len(lengths)), lengths)
+        by_scan = np.argsort(scan, kind="stable")
+        bounds = np.searchsorted(scan[by_scan], np.arange(height + 1))
+        self.crossing = [edge[by_scan[bounds[j]:bounds[j + 1]]] for j in range(height)]
+        self.order = np.arange(len(lengths))  # edge in each row of the column matrix
+        self.position = np.arange(len(lengths))  # row of each edge
+
+    def _x(self, edges, j):
+        return self.x[self.offsets[edges] + j - self.starts[edges]]
+
+    def sort_rows(self):
+        """Same row permutation as sort_cols: at each scanline the rows crossing it are sorted by x"""
+        for j in range(self.height):
+            edges = self.crossing[j]
+            if len(edges) < 2:
+                continue
+            rows = np.sort(self.position[edges])
+            row_edges = self.order[rows]
+            xs = self._x(row_edges, j)
+            valid = (xs+1) != 0  # o sort_cols ignora x == -1 (nonzero de col+1)
+            rows, row_edges, xs = rows[valid], row_edges[valid], xs[valid]
+            sorted_edges = row_edges[xs.argsort()]
+            self.order[rows] = sorted_edges
+            self.position[sorted_edges] = rows
+
+    def paths(self) -> MultiLineString:
+        """Same paths as get_rectilinear_path over the sorted column matrix"""
+        cells = self._cells()
+        up, down, right = self._links(cells)
+        x, scan = cells["x"], cells["scan"]
+        # caminhos em zigue-zague: sobe (ou desce) na linha de varredura até a próxima interseção que fecha o
+        # trecho, passa para a mesma aresta na linha seguinte e inverte o sentido, até chegar numa interseção usada
+        used = bytearray(len(x))
+        paths = []  # interseções de cada caminho, as coordenadas são montadas de uma vez no final
+        for c in np.lexsort((scan, cells["row"])).tolist():  # linha da matriz, depois linha de varredura
+            if used[c]:
+                continue
+            path = [c]
+            used[c] = 1
+            d = True
+            while True:
+                c = up[c] if d else down[c]
+                if c < 0 or used[c]:
+                    break
+                used[c] = 1
+                path.append(c)
+                d = not d
+                c = right[c]
+                if c < 0 or used[c]:
+                    break
+                used[c] = 1
+                path.append(c)
+            if len(path) > 1:
+                paths.append(path)
+        if not paths:
+            return MultiLineString()
+        # um único array de coordenadas, cortado em caminhos pelos índices (shapely.linestrings com indices=)
+        lengths = [len(path) for path in paths]
+        flat = np.fromiter(chain.from_iterable(paths), dtype=np.int64, count=sum(lengths))
+        coords = np.column_stack((x[flat], scan[flat]*self.gap))
+        return sp.multilinestrings(sp.linestrings(coords, indices=np.repeat(np.arange(len(paths)), lengths)))
+
+    def _cells(self) -> dict:
+        # interseções em ordem de linha de varredura e, dentro dela, de linha da matriz
+        rows = [np.sort(self.position[self.crossing[j]]) for j in range(self.height)]
+        counts = [len(r) for r in rows]
+        row = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        scan = np.repeat(np.arange(self.height), counts)
+        edges = self.order[row]
+        return {"row": row, "scan": scan, "x": self._x(edges, scan), "fill": self.fills[edges]}
+
+    def _links(self, cells) -> tuple[list, list, list]:
+        """
+        Neighbour of each intersection, -1 when there is none: up/down, the next intersection in the same scanline
+        closing the raster (next_line with d True/False), and right, the same row in the next scanline (next_con)
+        """
+        row, scan, fill = cells["row"], cells["scan"], cells["fill"]
+        index = np.arange(len(row))
+        # próxima interseção acima com fill 0, na mesma linha de varredura; nenhuma se a própria tem fill 0
+        zeros = np.nonzero(fill == 0)[0]
+        k = np.searchsorted(zeros, index, side="right")
+        up = np.full(len(row), -1, dtype=np.int64)
+        found = k < len(zeros)
+        up[found] = zeros[k[found]]
+        up[(fill == 0) | (up < 0) | (scan[np.maximum(up, 0)] != scan)] = -1
+        # interseção anterior com fill 1, na mesma linha de varredura; nenhuma se a própria tem fill 1
+        ones = np.nonzero(fill == 1)[0]
+        k = np.searchsorted(ones, index, side="left") - 1
+        down = np.full(len(row), -1, dtype=np.int64)
+        found = k >= 0
+        down[found] = ones[k[found]]
+        down[(fill == 1) | (down < 0) | (scan[np.maximum(down, 0)] != scan)] = -1
+        # mesma linha da matriz na linha de varredura seguinte (as chaves estão em ordem crescente)
+        key = scan * max(len(self.order), 1) + row
+        k = np.searchsorted(key, key + max(len(self.order), 1))
+        right = np.full(len(row), -1, dtype=np.int64)
+        found = k < len(key)
+        found[found] = key[k[found]] == key[found] + max(len(self.order), 1)
+        right[found] = k[found]
+        return up.tolist(), down.tolist(), right.tolist()
+
+
+def scanline_fill(shape, gap, angle=0, thres=0):
+    """
+    Rectilinear fill of a polygon, the same MultiLineString as rectilinear_fill with memory linear in the number of
+    edge/scanline intersections.
+
+    ARGS:
+    shape: region to fill (Polygon)
+    gap: distance between rasters (float)
+    angle: raster angle in degrees (float)
+    thres: edges with |dy| up to this value are ignored (float)
+
+    RETURNS:
+    MultiLineString
+    """
+    r_shape = rotate(shape, angle, origin=(0, 0))
+    tr_shape = translate(r_shape, -r_shape.bounds[0], -r_shape.bounds[1])
+    height = int(np.floor(tr_shape.bounds[3]/gap)+1)
+    edges = ScanlineEdges(gap, thres)
+    edges.add_ring(tr_shape.exterior, False)
+    for hole in tr_shape.interiors:
+        edges.add_ring(hole, True)
+    fill = ScanlineFill(edges, height)
+    fill.sort_rows()
+    if tr_shape.interiors:  # o rectilinear_fill ordena duas vezes quando há buracos
+        fill.sort_rows()
+    paths = fill.paths()
+    paths = translate(paths, r_shape.bounds[0], r_shape.bounds[1])
+    paths = rotate(paths, -angle, origin=(0, 0))
+    return paths
@@ -0,0 +1,87 @@
+import numpy as np
+import shapely as sp
+from shapely.geometry import MultiPolygon
+
+# simplificação das seções fatiadas: os polígonos vindos do stl carregam cada aresta da malha, e cada vértice é depois
+# bufferizado no perímetro/contorno, varrido no preenchimento e exportado no gcode. Os vértices são aproximados para
+# uma grade e as arestas simplificadas sem alterar a topologia
+
+
+class SimplifyReport:
+    """Vertex counts of each simplified section, before and after"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.layers: dict[float, tuple[int, int]] = {}  # height -> (vertices before, vertices after)
+
+    def add(self, height: float, before: int, after: int):
+        self.layers[height] = (before, after)
+
+    def totals(self) -> tuple[int, int]:
+        before = sum(b for b, _ in self.layers.values())
+        after = sum(a for _, a in self.layers.values())
+        return before, after
+
+    def __str__(self):
+        before, after = self.totals()
+        removed = 100 * (1 - after / before) if before else 0.0
+        lines = ["{} sections: {} -> {} vertices ({:.1f}% removed)".format(self.name, before, after, removed)]
+        for height, (b, a) in self.layers.items():
+            lines.append("  z={:.3f}: {} -> {}".format(height, b, a))
+        return "\n".join(lines)
+
+
+class SectionSimplifier:
+    """Snaps the section vertices to a grid and simplifies the section edges, keeping the topology valid"""
+
+    def __init__(self, tolerance: float = 0, grid: float = 0):
+        self.tolerance = tolerance  # max distance (mm) between the simplified and the original edges
+        self.grid = grid  # size (mm) of the grid the vertices are snapped to, near-duplicates merge
+
+    def simplify(self, sections):
+        """
+        Simplifies an array of sections at once.
+
+        ARGS:
+        sections: sections (list of MultiPolygon)
+
+        RETURNS:
+        List of MultiPolygon
+        """
+        geoms = np.asarray(sections, dtype=object)
+        if self.grid:
+            geoms = sp.set_precision(geoms, self.grid)
+        if self.tolerance:
+            geoms = sp.simplify(geoms, self.tolerance, preserve_topology=True)
+        return [as_multipolygon(geom) for geom in geoms]
+
+    def apply(self, planes: dict, report: SimplifyReport) -> dict:
+        """
+        Simplifies every section of a planes dict (height -> MultiPolygon), recording the vertex counts.
+
+        RETURNS:
+        New planes dict with the simplified sections
+        """
+        heights = list(planes.keys())
+        sections = [planes[h] for h in heights]
+        simplified = self.simplify(sections)
+        before = sp.get_num_coordinates(np.asarray(sections, dtype=object))
+        after = sp.get_num_coordinates(np.asarray(simplified, dtype=object))
+        for height, b, a in zip(heights, before, after):
+            report.add(height, int(b), int(a))
+        return dict(zip(heights, simplified))
+
+
+def as_multipolygon(geom) -> MultiPolygon:
+    """Keeps only the polygonal parts of a geometry, as a MultiPolygon (the type the layers expect)"""
+    if isinstance(geom, MultiPolygon):
+        return geom
+    if geom.geom_type == "Polygon":
+        return MultiPolygon([geom]) if not geom.is_empty else MultiPolygon()
+    polygons = []
+    for part in getattr(geom, "geoms", []):  # a snapped section may degenerate into lines or points
+        if part.geom_type == "Polygon" and not part.is_empty:
+            polygons.append(part)
+        elif part.geom_type == "MultiPolygon":
+            polygons.extend(part.geoms)
+    return MultiPolygon(polygons)
@@ -0,0 +1,160 @@
+import numpy as np
+import shapely as sp
+from multiprocessing import resource_tracker, shared_memory
+
+# transporte de geometrias entre processos por memória compartilhada: em vez de serializar (pickle/WKB) cada
+# MultiPolygon ou MultiLineString, os grupos de geometrias viram arrays de coordenadas e offsets (to_ragged_array),
+# copiados uma vez para um bloco de memória compartilhada. Só um descritor pequeno (nome do bloco e layout) passa
+# pela fila do pool, e o outro processo lê os arrays no próprio bloco para reconstruir as geometrias
+
+
+class SharedHandle:
+    """Picklable description of a shared block: its name and where each array is"""
+
+    __slots__ = ("name", "layout", "groups")
+
+    def __init__(self, name: str, layout: dict, groups: dict):
+        self.name = name
+        self.layout = layout  # array name -> (dtype, shape, byte offset)
+        self.groups = groups  # group name -> (encoding, geometry type, number of offset arrays)
+
+    def __getstate__(self):
+        return self.name, self.layout, self.groups
+
+    def __setstate__(self, state):
+        self.name, self.layout, self.groups = state
+
+
+def start_transport():
+    """
+    Starts the resource tracker before a pool forks its workers, so blocks created by a worker and released by the
+    parent (or the other way around) are tracked by the same process.
+    """
+    resource_tracker.ensure_running()
+
+
+def share_arrays(arrays: dict, groups: dict = None) -> SharedHandle:
+    """
+    Copies arrays into a new shared block.
+
+    ARGS:
+    arrays: name -> array (dict of np.ndarray)
+    groups: geometry groups stored in the arrays (see share_geometries)
+
+    RETURNS:
+    Handle of the block, to be released with release() by whoever reads it last
+    """
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        size = -(-size // 8) * 8  # 8 byte alignment
+        layout[name] = (array.dtype.str, array.shape, size)
+        size += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, array in arrays.items():
+        dtype, shape, offset = layout[name]
+        view = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        view[...] = array
+        del view
+    handle = SharedHandle(block.name, layout, groups or {})
+    block.close()
+    return handle
+
+
+def read_arrays(handle: SharedHandle, function):
+    """
+    Calls function with the arrays of a shared block, as views of the block (no copy). The views are only valid
+    during the call: function must build its result from them (geometries, copies) and not keep them.
+    """
+    block = shared_memory.SharedMemory(name=handle.name)
+    try:
+        arrays = {name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+                  for name, (dtype, shape, offset) in handle.layout.items()}
+        result = function(arrays)
+        del arrays
+    finally:
+        block.close()
+    return result
+
+
+def release(handle: SharedHandle):
+    """Frees a shared block, once it has been read"""
+    block = shared_memory.SharedMemory(name=handle.name)
+    block.close()
+    block.unlink()
+
+
+def share_geometries(groups: dict) -> SharedHandle:
+    """
+    Places groups of geometries in a shared block.
+
+    ARGS:
+    groups: group name -> list of geometries. A group of one geometry type (single and multi parts may be mixed) is
+    stored as ragged coordinate arrays, any other group as WKB. In a mixed group the single part geometries are
+    stored as one part multi geometries and flagged, read_geometries gives them back as single parts
+
+    RETURNS:
+    Handle of the block (SharedHandle)
+    """
+    arrays = {}
+    encodings = {}
+    for group, geoms in groups.items():
+        geoms = np.asarray(geoms, dtype=object)
+        try:
+            geom_type, coords, offsets = sp.to_ragged_array(geoms)
+        except ValueError:  # mixed geometry types
+            wkb = sp.to_wkb(geoms)
+            sizes = np.fromiter((len(b) for b in wkb), dtype=np.int64, count=len(wkb))
+            arrays[group + ".wkb"] = np.frombuffer(b"".join(wkb), dtype=np.uint8)
+            arrays[group + ".sizes"] = sizes
+            encodings[group] = ("wkb", None, 0)
+            continue
+        arrays[group + ".coords"] = coords
+        # o to_ragged_array promove as partes simples a multi quando o grupo mistura os dois (Polygon e MultiPolygon)
+        single = sp.get_type_id(geoms) != int(geom_type)
+        if single.any():
+            arrays[group + ".single"] = single.astype(np.uint8)
+        for k, offset in enumerate(offsets):
+            arrays["{}.offsets{}".format(group, k)] = offset
+        encodings[group] = ("ragged", int(geom_type), len(offsets))
+    return share_arrays(arrays, encodings)
+
+
+def read_geometries(handle: SharedHandle) -> dict:
+    """Rebuilds the groups of geometries of a shared block (group name -> list of geometries)"""
+    def build(arrays):
+        groups = {}
+        for group, (encoding, geom_type, n_offsets) in handle.groups.items():
+            if encoding == "wkb":
+                data = arrays[group + ".wkb"].tobytes()
+                ends = np.cumsum(arrays[group + ".sizes"]).tolist()
+                starts = [0] + ends[:-1]
+                groups[group] = list(sp.from_wkb([data[a:b] for a, b in zip(starts, ends)]))
+            else:
+                offsets = tuple(arrays["{}.offsets{}".format(group, k)] for k in range(n_offsets))
+                geoms = sp.from_ragged_array(sp.GeometryType(geom_type), arrays[group + ".coords"], offsets)
+                if group + ".single" in arrays:
+                    single = arrays[group + ".single"].astype(bool)
+                    geoms[single] = sp.get_geometry(geoms[single], 0)
+                groups[group] = list(geoms)
+        return groups
+    return read_arrays(handle, build)
+
+
+def discard(futures, handles=()):
+    """
+    Cleanup of an interrupted exchange: cancels the futures not started yet, waits for the others and releases the
+    shared blocks they returned, then releases the input blocks (handles) once no worker can be reading them.
+    """
+    for future in futures:
+        if future.cancel():
+            continue
+        try:
+            result = future.result()
+        except Exception:
+            continue
+        if isinstance(result, SharedHandle):
+            release(result)
+    for handle in handles:
+        if handle is not None:
+            release(handle)
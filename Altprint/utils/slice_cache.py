@@ -0,0 +1,122 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+
+# cache em disco dos planos fatiados (SlicedPlanes), endereçado pelo conteúdo do stl. Evita recarregar e refatiar o
+# mesmo modelo quando só os parâmetros de fluxo/velocidade mudam entre execuções
+
+
+_digest_memo: dict = {}  # (path, mtime, size) -> sha256, so a file is hashed once per process
+
+
+def file_digest(path: str) -> str:
+    """
+    Calculates the sha256 digest of a file's content.
+
+    ARGS:
+    path: file name (str)
+
+    RETURNS:
+    Hex digest of the file content (str)
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _digest_memo:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        _digest_memo[memo_key] = sha.hexdigest()
+    return _digest_memo[memo_key]
+
+
+class SliceCache:
+    """On-disk LRU cache of SlicedPlanes (and other slicing products), keyed by stl content, translation, heights and slicer version"""
+
+    suffix = '.slice'
+
+    def __init__(self, cache_dir: str, max_size: int = 512 * 2**20):
+        self.cache_dir = cache_dir  # directory that stores one pickle file per entry
+        self.max_size = max_size  # total size (bytes) kept on disk before evicting the least recently used entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, model_file: str, translation, heights, version: str) -> str:
+        """
+        Builds the entry key.
+
+        ARGS:
+        model_file: stl file name (str)
+        translation: translation applied to the model (array)
+        heights: list of heights, or the HeightMethod used to compute them
+        version: slicer version, bumps invalidate every entry (str)
+        """
+        if isinstance(heights, (list, tuple, np.ndarray)):
+            heights_id = np.asarray(heights, dtype=np.float64).tobytes()
+        else:  # height method: the heights depend only on its class and parameters
+            heights_id = repr((type(heights).__name__, sorted(vars(heights).items()))).encode()
+        sha = hashlib.sha256()
+        sha.update(file_digest(model_file).encode())
+        sha.update(np.asarray(translation, dtype=np.float64).tobytes())
+        sha.update(heights_id)
+        sha.update(version.encode())
+        return sha.hexdigest()
+
+    def make_content_key(self, model_file: str, *params) -> str:
+        """Key of an entry derived only from the stl content and a few parameters (e.g. the decimated mesh)"""
+        sha = hashlib.sha256()
+        sha.update(file_digest(model_file).encode())
+        sha.update(repr(params).encode())
+        return sha.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key: str):
+        """Returns the cached entry, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry):
+        """Stores an entry (any picklable object) and evicts the oldest entries above max_size"""
+        path = self._path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # atomic, concurrent runs never read a partial entry
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits max_size"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:  # evicted by a concurrent run
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -1,8 +1,16 @@
 from typing import Optional
 from abc import ABC, abstractmethod
-import trimesh
+import copy
+import numpy as np
 from shapely.geometry import MultiPolygon
 from Altprint.utils.height_method import HeightMethod
+from Altprint.utils.slice_cache import SliceCache
+from Altprint.utils.zsweep import sweep_sections, iter_sweep_sections
+from Altprint.utils.stl_loader import load_stl, TriangleSoup
+from Altprint.utils.decimate import decimate, DecimationReport
+
+# bump whenever a change alters the sliced geometry, invalidating the SliceCache entries
+SLICER_VERSION = "1"
 
 
 # este arquivo tem como funcionalidade, ler um arquivo em stl, movimentar a peça e depois fatiar ela em planos associados a cada camada (STLslicer), isso é armazenado em um objeto que recebe essas informações e armazena a altura de cada camada, a geometria de cada camada e os limites superior e inferior da peça (SlicedPlanes)
@@ -51,37 +59,354 @@ class STLSlicer(Slicer):
     """Slice .stl cad files"""
 
     # Constructor method with argument an instance of HeightMethod (abstract class)
-    def __init__(self, height_method: HeightMethod):
+    def __init__(self, height_method: HeightMethod, cache: Optional[SliceCache] = None, engine: str = "trimesh",
+                 workers: int = 1, loader: str = "trimesh", decimate_tolerance: Optional[float] = None):
         self.height_method = height_method
-        self.model: Optional[trimesh.Trimesh] = None
+        # chordal tolerance (mm) of the mesh simplification done before slicing, None disables it
+        self.decimate_tolerance = decimate_tolerance
+        self.decimation_report: Optional[DecimationReport] = None
+        # "trimesh": trimesh.load_mesh; "mmap": binary stl memory-mapped into a TriangleSoup (trimesh only for ascii files)
+        self.loader = loader
+        # "trimesh": section_multiplane over the whole mesh; "sweep": z-interval index, each plane only visits the faces spanning it
+        self.engine = engine
+        # optional on-disk cache of the slicing results, with it the mesh is only loaded on a cache miss
+        self.cache = cache
+        # number of processes slicing height bands in parallel (1 = serial)
+        self.workers = workers
+        # sections of the parallel bands come back through shared memory instead of being pickled
+        self.shared_transport = False
+        self.model = None  # trimesh.Trimesh (or TriangleSoup), loaded on demand
+        self.model_file: Optional[str] = None
+        self.translations: list = []  # translations applied to the model, in order
+        self.joint_flex_slicer: Optional["STLSlicer"] = None  # slicer of the flex model in the last slice_joint
 
     # Loads an STL mesh from the specified file. It uses the trimesh.load_mesh() function from the trimesh library to read the mesh data from the file
     def load_model(self, model_file: str):
-        self.model = trimesh.load_mesh(model_file)
+        self.model_file = model_file
+        self.translations = []
+        self.model = None
+        self.decimation_report = None
+        if self.cache is None:
+            self._load_mesh()
+
+    def _load_mesh(self):
+        if self.loader == "mmap":
+            self.model = load_stl(self.model_file)
+        elif self.loader == "trimesh":
+            import trimesh  # heavy import, skipped when the slices come from the cache
+            self.model = trimesh.load_mesh(self.model_file)
+        else:
+            raise ValueError("unknown stl loader: {}".format(self.loader))
+        if self.decimate_tolerance:
+            self._decimate_mesh()
+        for translation in self.translations:
+            self.model.apply_translation(translation)
+
+    def _decimate_mesh(self):
+        """Replaces the loaded mesh by its decimation, reusing a cached one for the same stl content"""
+        key = None
+        entry = None
+        if self.cache is not None:
+            key = self.cache.make_content_key(self.model_file, "decimate", self.decimate_tolerance)
+            entry = self.cache.get(key)
+        if entry is None:
+            entry = decimate(self.model.triangles, self.decimate_tolerance)
+            if self.cache is not None:
+                self.cache.put(key, entry)
+        triangles, self.decimation_report = entry
+        self.model = TriangleSoup(triangles)
+
+    def settings(self) -> tuple:
+        """Everything of the slicer itself that changes the sections: not the workers, the cache or the transport"""
+        return (type(self.height_method).__name__, sorted(vars(self.height_method).items()), self.engine, self.loader,
+                self.decimate_tolerance or 0)
+
+    def _cache_version(self) -> str:
+        """Everything besides the stl, translation and heights that changes the sections"""
+        return "{}-{}-{}".format(SLICER_VERSION, self.engine, self.decimate_tolerance or 0)
 
     # The "translation" argument specifies the amount by which the model should be moved in 3D space
     def translate_model(self, translation):
-        # The apply_translation() method of the mesh object modifies the coordinates of all vertices by the specified translation vector
-        self.model.apply_translation(translation)
+        self.translations.append(translation)
+        if self.model is not None:
+            # The apply_translation() method of the mesh object modifies the coordinates of all vertices by the specified translation vector
+            self.model.apply_translation(translation)
 
     # esse método fatia o modelo carregado em planos de seção (paralelos ao plano XY) em alturas especificadas
     def slice_model(self, heights=None) -> SlicedPlanes:
+        if self.cache is None:
+            return self._slice_mesh(heights)
+        key = self._planes_key(heights)
+        sliced_planes = self.cache.get(key)
+        if sliced_planes is None:
+            sliced_planes = self._slice_mesh(heights)
+            self._put_planes(key, sliced_planes)
+        return sliced_planes
+
+    def _put_planes(self, key: str, sliced_planes: SlicedPlanes):
+        # os limites ficam também numa entrada própria, lida por get_bounds sem carregar a malha nem as seções
+        self.cache.put(key, sliced_planes)
+        self.cache.put(self._planes_key(variant="-bounds"), sliced_planes.bounds)
+
+    def _planes_key(self, heights=None, variant: str = "") -> str:
+        # without explicit heights, they are fully determined by the height method parameters
+        return self.cache.make_key(self.model_file, np.reshape(self.translations, (-1, 3)),
+                                   heights if heights else self.height_method,
+                                   self._cache_version() + variant)
+
+    def slice_joint(self, flex_model_file: str) -> tuple[SlicedPlanes, SlicedPlanes]:
+        """
+        Slices the loaded model and a flex model (same translations) at the model heights, in a single pass.
+
+        The flex mesh is loaded and sliced in a separate process while the model is sliced. Flex sections outside
+        the model z-range or bounding box are not computed (left empty).
+
+        ARGS:
+        flex_model_file: stl file of the flex region (str)
+
+        RETURNS:
+        (model SlicedPlanes, flex SlicedPlanes)
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        flex = self._joint_flex(flex_model_file)
+        model_planes = self.cache.get(self._planes_key()) if self.cache is not None else None
+        if model_planes is None:
+            if self.model is None:
+                self._load_mesh()
+            heights = self.get_heights()
+            model_bounds = np.array(self.model.bounds)
+        else:
+            heights = model_planes.get_heights()
+            model_bounds = np.asarray(model_planes.bounds)
+
+        flex_key = flex._joint_key(heights, model_bounds)
+        flex_planes = flex.cache.get(flex_key) if flex_key is not None else None
+        if flex_planes is not None and model_planes is not None:
+            return model_planes, flex_planes
+
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            flex_job = None
+            if flex_planes is None:
+                flex_job = pool.submit(_slice_flex, flex, heights, model_bounds)
+            if model_planes is None:
+                model_planes = self._slice_mesh(heights)
+                if self.cache is not None:
+                    self._put_planes(self._planes_key(), model_planes)
+            if flex_job is not None:
+                flex_planes, flex.decimation_report = flex_job.result()
+                if flex_key is not None:
+                    flex.cache.put(flex_key, flex_planes)
+        return model_planes, flex_planes
+
+    def slice_joint_flex(self, flex_model_file: str, heights, model_bounds) -> SlicedPlanes:
+        """
+        Flex sections of slice_joint alone, for a flex model edited after the joint slicing: sliced at the model
+        heights, empty outside the model bounds, with the same cache entry.
+
+        ARGS:
+        flex_model_file: stl file of the flex region (str)
+        heights: model heights (list of float)
+        model_bounds: bounds of the model (array)
+        """
+        flex = self._joint_flex(flex_model_file)
+        key = flex._joint_key(heights, model_bounds)
+        flex_planes = flex.cache.get(key) if key is not None else None
+        if flex_planes is None:
+            flex_planes, flex.decimation_report = _slice_flex(flex, heights, model_bounds)
+            if key is not None:
+                flex.cache.put(key, flex_planes)
+        return flex_planes
+
+    def _joint_flex(self, flex_model_file: str) -> "STLSlicer":
+        # slicer da região flexível com as mesmas configurações e translações, sem malha carregada
+        flex = copy.copy(self)
+        flex.model_file = flex_model_file
+        flex.translations = list(self.translations)
+        flex.model = None
+        flex.decimation_report = None
+        flex.joint_flex_slicer = None
+        self.joint_flex_slicer = flex  # keeps the flex decimation report
+        return flex
+
+    def _joint_key(self, heights, model_bounds) -> Optional[str]:
+        # as seções fora dos limites do modelo ficam vazias: os limites (arredondados) fazem parte da chave
+        if self.cache is None:
+            return None
+        bounds_tag = ",".join("{:.6f}".format(v) for v in np.round(model_bounds, 6).ravel())
+        return self._planes_key(heights, "-joint-" + bounds_tag)
+
+    def _slice_overlapping(self, heights, bounds) -> SlicedPlanes:
+        """Slices only the heights inside both this mesh and the given bounds, the others get empty sections"""
+        own_bounds = np.array(self.model.bounds)
+        eps = 1e-6  # planes farther than this from the mesh z-range cross no face
+        overlap_xy = (own_bounds[0][:2] <= bounds[1][:2]).all() and (own_bounds[1][:2] >= bounds[0][:2]).all()
+        inside = [h for h in heights
+                  if overlap_xy
+                  and bounds[0][2] - eps <= h <= bounds[1][2] + eps
+                  and own_bounds[0][2] - eps <= h <= own_bounds[1][2] + eps]
+        planes = self._slice_mesh(inside).planes if inside else {}
+        return SlicedPlanes({h: planes.get(h, MultiPolygon()) for h in heights}, own_bounds)
+
+    def __getstate__(self):
+        # sent to the slicing workers without the mesh, each worker loads its own copy; a decimated mesh goes along
+        # (already translated), so the decimation runs only once, in the parent
+        state = self.__dict__.copy()
+        if self.decimate_tolerance and isinstance(self.model, TriangleSoup):
+            state['model'] = TriangleSoup(self.model.triangles)
+        else:
+            state['model'] = None
+        return state
+
+    def get_heights(self) -> list[float]:
+        """Heights of the loaded model given by the height method, from the cache if any (no mesh loading)"""
+        return self._cached("-heights", lambda: self.height_method.get_heights(self.model.bounds, self.model))
+
+    def get_bounds(self) -> np.ndarray:
+        """Bounds of the loaded model, from the cache if any (no mesh loading)"""
+        return self._cached("-bounds", lambda: np.array(self.model.bounds))
+
+    def _cached(self, variant: str, compute):
+        # valor derivado só da malha (já transladada), lido do cache ou calculado com a malha carregada
+        key = self._planes_key(variant=variant) if self.cache is not None else None
+        if key is not None:
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+        if self.model is None:
+            self._load_mesh()
+        value = compute()
+        if key is not None:
+            self.cache.put(key, value)
+        return value
+
+    def iter_planes(self, heights=None, chunk_size: int = 8):
+        """
+        Slices the model lazily, yielding (height, MultiPolygon) in height order.
+
+        Only a few planes are sectioned at a time, so the consumer can start working on the lower layers (and
+        drop them) while the upper ones are not sliced yet. An existing cache entry of the whole model is streamed
+        as is; otherwise, with a cache, each chunk of planes is its own entry, and the mesh is only loaded for a
+        chunk missing from it.
+        """
+        if self.cache is not None:
+            sliced_planes = self.cache.get(self._planes_key(heights))
+            if sliced_planes is not None:
+                yield from sliced_planes.planes.items()
+                return
+        if not heights:
+            heights = self.get_heights()
+        if self.cache is not None:
+            for start in range(0, len(heights), chunk_size):
+                chunk = heights[start:start + chunk_size]
+                key = self._planes_key(chunk, "-chunk")
+                planes = self.cache.get(key)
+                if planes is None:
+                    planes = self._section_planes(chunk)
+                    self.cache.put(key, planes)
+                yield from planes.items()
+            return
+        if self.model is None:
+            self._load_mesh()
+        if self.engine == "sweep":
+            for k, section in iter_sweep_sections(self.model.vertices, self.model.faces, heights):
+                yield heights[k], section_to_multipolygon(section)
+        else:
+            for start in range(0, len(heights), chunk_size):
+                yield from self._section_planes(heights[start:start + chunk_size]).items()
+
+    def _slice_mesh(self, heights=None) -> SlicedPlanes:
+        if self.model is None:
+            self._load_mesh()
         if not heights:  # If heights is not provided, it calculates the heights
-            heights = self.height_method.get_heights(self.model.bounds)
-        # It uses the section_multiplane() function from the trimesh library to obtain the sections
-        sections = self.model.section_multiplane([0, 0, 0], [0, 0, 1], heights)
+            heights = self.get_heights()
+        if self.workers > 1 and len(heights) > 1:
+            planes = self._section_planes_parallel(heights)
+        else:
+            planes = self._section_planes(heights)
+        # returns a object containing the plans and the model bounds (plain array, so unpickling a cached entry needs no trimesh)
+        return SlicedPlanes(planes, np.array(self.model.bounds))
+
+    def _section_planes(self, heights) -> dict:
+        if self.model is None:
+            self._load_mesh()
+        if self.engine == "sweep":
+            sections = sweep_sections(self.model.vertices, self.model.faces, heights)
+        elif self.engine == "trimesh":
+            # It uses the section_multiplane() function from the trimesh library to obtain the sections
+            sections = self.model.section_multiplane([0, 0, 0], [0, 0, 1], heights)
+        else:
+            raise ValueError("unknown slicing engine: {}".format(self.engine))
         planes = {}  # empty list to storage the plans
         for i, section in enumerate(sections):  # For each section
-            if section:  # If the section is not empty, converts the section polygons to a MultiPolygon and associates it with the corresponding height
-                planes[heights[i]] = MultiPolygon(
-                    list(section.polygons_full))  # Essa fç vem de <path.py>
-            # If the section is empty (no geometry), associates an empty list with the corresponding height
-            else:
-                # Mesma coisa que planes[heights[i]] = [], só que evita bugs de atributte error
-                planes[heights[i]] = MultiPolygon()
+            planes[heights[i]] = section_to_multipolygon(section)
+        return planes
+
+    def _section_planes_parallel(self, heights) -> dict:
+        """Slices contiguous height bands in a process pool, each worker loading the mesh once"""
+        from concurrent.futures import ProcessPoolExecutor
+        from Altprint.utils.shared_geometry import SharedHandle, start_transport, read_geometries, release, discard
+
+        # a few bands per worker balances parts whose cross-section varies along z
+        n_bands = min(len(heights), self.workers * 4)
+        bounds = np.linspace(0, len(heights), n_bands + 1).astype(int)
+        bands = [heights[bounds[k]:bounds[k+1]] for k in range(n_bands)]
+        planes = {}
+        if self.shared_transport:
+            start_transport()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_band_worker,
+                                 initargs=(self, )) as pool:
+            futures = [pool.submit(_slice_band, band) for band in bands]
+            done = 0
+            try:
+                for band, future in zip(bands, futures):  # bands read in height order
+                    band_planes = future.result()
+                    done += 1
+                    if isinstance(band_planes, SharedHandle):
+                        try:
+                            sections = read_geometries(band_planes)["sections"]
+                        finally:
+                            release(band_planes)
+                        band_planes = dict(zip(band, sections))
+                    planes.update(band_planes)
+            finally:
+                # blocos das faixas não lidas, se uma falhou
+                discard(futures[done:])
+        return planes
+
+
+def section_to_multipolygon(section) -> MultiPolygon:
+    if section:  # If the section is not empty, converts the section polygons to a MultiPolygon
+        return MultiPolygon(list(section.polygons_full))  # Essa fç vem de <path.py>
+    # If the section is empty (no geometry), an empty MultiPolygon
+    # Mesma coisa que [], só que evita bugs de atributte error
+    return MultiPolygon()
+
+
+_band_slicer: Optional[STLSlicer] = None  # mesh loaded once per worker process
+
+
+def _init_band_worker(slicer: STLSlicer):
+    global _band_slicer
+    # the slicer arrives without its mesh (see __getstate__) and loads it once, replaying the translations, unless
+    # the decimated mesh came with it
+    _band_slicer = slicer
+    if _band_slicer.model is None:
+        _band_slicer._load_mesh()
+
+
+def _slice_band(heights):
+    planes = _band_slicer._section_planes(heights)
+    if _band_slicer.shared_transport:
+        from Altprint.utils.shared_geometry import share_geometries
+        return share_geometries({"sections": [planes[h] for h in heights]})
+    return planes
+
 
-        # returns a object containing the plans and the model bounds
-        return SlicedPlanes(planes, self.model.bounds)
+def _slice_flex(flex: STLSlicer, heights, model_bounds):
+    flex._load_mesh()
+    return flex._slice_overlapping(heights, model_bounds), flex.decimation_report
 
 
 # In summary, the STLSlicer class loads an STL model, allows translation, and slices it into section planes. The resulting section planes are stored along with their heights and the model bounds in a SlicedPlanes object
+# With a SliceCache the mesh loading is deferred until a cache miss, so a hit never touches trimesh
@@ -0,0 +1,80 @@
+from typing import Optional
+
+# dependências entre os parâmetros do FlexProcess e os estágios da geração do gcode: cada estágio guarda os valores
+# dos parâmetros com que rodou por último, e ao mudar um parâmetro só o estágio que o usa e os seguintes rodam de novo
+# (ex.: uma varredura de fluxo refaz só os rasters e a exportação, sem fatiar nem recalcular as trajetórias)
+
+# stages in execution order, each one consumes the output of the previous
+STAGES = ("slicing", "offsets", "infill", "ordering", "split", "rasters", "gcode")
+
+# FlexProcess parameters read by each stage
+STAGE_PARAMS = {
+    "slicing": ("model_file", "flex_model_file", "offset", "slicer", "stl_loader", "slice_engine", "decimate_tolerance",
+                "section_simplify_tolerance", "section_snap_grid", "joint_slicing", "stream_slicing"),
+    "offsets": ("perimeter_num", "perimeter_gap", "external_adjust", "overlap", "skirt_distance", "skirt_num",
+                "skirt_gap"),
+    "infill": ("infill_method", "infill_angle", "raster_gap", "horizontal_gap_flex_infill", "horizontal_num_gap",
+               "horizontal_perc_gap", "orientation_gap"),
+    "ordering": ("best_path", "threshold_walk_around", "infill_angle_search", "angle_cost"),
+    "split": ("apply_walk_around", ),
+    "rasters": ("flow", "speed", "first_layer_flow", "flex_flow", "flex_speed", "retract_flow", "retract_speed",
+                "retract_ratio"),
+    "gcode": ("travel_speed", "retraction", "gcode_exporter", "start_script", "end_script"),
+}
+# os demais parâmetros (verbose, caches, workers, modo de execução...) não mudam o gcode
+
+
+def stage_params(stage: str, process) -> tuple:
+    """Parameters read by a stage with the current settings: STAGE_PARAMS plus the ones some modes add"""
+    params = STAGE_PARAMS[stage]
+    if (stage == "ordering" and getattr(process, "infill_angle_search", False)
+            and getattr(process, "angle_cost", None) == "time"):
+        # o ângulo de cada camada é escolhido pelo tempo estimado, que depende das velocidades
+        params = params + ("speed", "travel_speed")
+    return params
+
+
+def _freeze(value):
+    # listas e dicionários copiados, para uma alteração no próprio objeto ainda ser detectada; objetos com
+    # settings() (o slicer) comparados pelas próprias configurações e não pela identidade
+    settings = getattr(value, "settings", None)
+    if callable(settings):
+        return type(value).__name__, _freeze(settings())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    return value
+
+
+class StageTracker:
+    """Parameter values each stage last ran with"""
+
+    def __init__(self):
+        self._snapshots: dict[str, tuple] = {}
+
+    def _values(self, stage: str, process) -> tuple:
+        return tuple((name, _freeze(getattr(process, name, None))) for name in stage_params(stage, process))
+
+    def first_dirty(self, process) -> Optional[str]:
+        """
+        First stage that must run again: never ran, or one of its parameters changed. Every stage after it must
+        run again too.
+
+        RETURNS:
+        Stage name, or None when every stage is up to date
+        """
+        for stage in STAGES:
+            if self._snapshots.get(stage) != self._values(stage, process):
+                return stage
+        return None
+
+    def record(self, process, stages=STAGES):
+        """Records the current parameter values of stages that just ran"""
+        for stage in stages:
+            self._snapshots[stage] = self._values(stage, process)
+
+    def invalidate(self, stage: str):
+        """Forces a stage and the following ones to run again (their input changed)"""
+        for later in STAGES[STAGES.index(stage):]:
+            self._snapshots.pop(later, None)
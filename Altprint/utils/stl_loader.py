@@ -0,0 +1,100 @@
+import os
+import numpy as np
+
+# leitura direta de stl binário: o arquivo é mapeado em memória como um array estruturado do numpy, sem o
+# processamento (merge de vértices, caches) que o trimesh.load_mesh faz e que o fatiamento não usa
+
+# layout of a binary stl triangle record (50 bytes), after the 80 bytes header and the uint32 triangle count
+STL_RECORD = np.dtype([('normal', '<f4', (3,)),
+                       ('vertices', '<f4', (3, 3)),
+                       ('attribute', '<u2')])
+STL_HEADER_SIZE = 84
+
+
+def is_binary_stl(path: str) -> bool:
+    """Checks if the file size matches the triangle count of a binary stl header"""
+    size = os.path.getsize(path)
+    if size < STL_HEADER_SIZE:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    return size == STL_HEADER_SIZE + count * STL_RECORD.itemsize
+
+
+def map_binary_stl(path: str) -> np.ndarray:
+    """
+    Memory-maps the triangle records of a binary stl.
+
+    ARGS:
+    path: stl file name (str)
+
+    RETURNS:
+    Read-only structured array (n,) with the fields normal, vertices (3, 3) and attribute
+    """
+    count = (os.path.getsize(path) - STL_HEADER_SIZE) // STL_RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=STL_RECORD)
+    return np.memmap(path, dtype=STL_RECORD, mode='r', offset=STL_HEADER_SIZE, shape=(count,))
+
+
+class TriangleSoup:
+    """Triangle list without topology, exposing what the slicer needs from a mesh (vertices, faces, bounds)"""
+
+    def __init__(self, triangles):
+        self.raw_triangles = triangles  # (n, 3, 3) float32, usually a view on the memory-mapped file
+        self._vertices = None
+        self._mesh = None  # trimesh.Trimesh built on the first section_multiplane
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """
+        (3n, 3) float64 vertices, one per triangle corner. This is a float64 copy of the mapped float32 records (made
+        once, on first access), so the intersections are computed in the same precision as with trimesh.load_mesh
+        """
+        if self._vertices is None:
+            self._vertices = np.asarray(self.raw_triangles, dtype=np.float64).reshape((-1, 3))
+        return self._vertices
+
+    @property
+    def faces(self) -> np.ndarray:
+        return np.arange(len(self.vertices)).reshape((-1, 3))
+
+    @property
+    def triangles(self) -> np.ndarray:
+        return self.vertices.reshape((-1, 3, 3))
+
+    @property
+    def bounds(self) -> np.ndarray:
+        return np.array([self.vertices.min(axis=0), self.vertices.max(axis=0)])
+
+    def apply_translation(self, translation):
+        self._vertices = self.vertices + np.asarray(translation, dtype=np.float64)
+        self._mesh = None
+
+    def to_trimesh(self):
+        """Builds the full trimesh.Trimesh (merged vertices), as trimesh.load_mesh would"""
+        import trimesh
+        return trimesh.Trimesh(vertices=self.vertices, faces=self.faces)
+
+    def section_multiplane(self, plane_origin, plane_normal, heights):
+        # a malha (com o merge de vértices) é montada uma vez e reaproveitada em todos os lotes de planos
+        if self._mesh is None:
+            self._mesh = self.to_trimesh()
+        return self._mesh.section_multiplane(plane_origin, plane_normal, heights)
+
+
+def load_stl(path: str) -> TriangleSoup:
+    """
+    Loads an stl file as a TriangleSoup, memory-mapping binary files and falling back to trimesh for ascii ones.
+
+    ARGS:
+    path: stl file name (str)
+
+    RETURNS:
+    TriangleSoup
+    """
+    if is_binary_stl(path):
+        return TriangleSoup(map_binary_stl(path)['vertices'])
+    import trimesh
+    return TriangleSoup(trimesh.load_mesh(path).triangles)
@@ -0,0 +1,130 @@
+from typing import Optional
+import numpy as np
+import shapely as sp
+from Altprint.utils.flow import calculate
+
+# armazenamento colunar das trajetórias de uma camada: em vez de uma lista de objetos Raster (cada um com seu
+# LineString e três arrays), todas as coordenadas da camada ficam num único array contíguo e cada raster é uma
+# linha nas colunas de offset, tamanho, fluxo, velocidade, tipo e máscara
+
+# raster kinds, stored as int8 codes in the kind column
+PERIMETER, INFILL, FLEX, RETRACT, WALK_AROUND = range(5)
+
+
+class LayerToolpath:
+    """Columnar store of the rasters of a layer, in printing order"""
+
+    def __init__(self, layer_height: Optional[float] = None):
+        """
+        ARGS:
+        layer_height: layer thickness used by the flow calculation (mm), the default of flow.calculate if not given
+        (float)
+        """
+        self.layer_height = layer_height
+        # rasters added since the last build, concatenated into the columns on first read
+        self._pending_coords: list = []
+        self._pending_rows: list = []  # (flow, speed, kind, mask)
+        self._coords = np.empty((0, 2))
+        self._offsets = np.empty(0, dtype=np.int64)
+        self._lengths = np.empty(0, dtype=np.int64)
+        self._flow = np.empty(0)
+        self._speed = np.empty(0)
+        self._kind = np.empty(0, dtype=np.int8)
+        self._mask = np.empty(0, dtype=np.int8)
+        self._extrusion = np.empty(0)
+
+    def add(self, path, flow, speed, kind: int, mask=0):
+        """
+        Appends a raster.
+
+        ARGS:
+        path: raster path (LineString)
+        flow: flow multiplier (float)
+        speed: printing speed (float)
+        kind: PERIMETER, INFILL, FLEX, RETRACT or WALK_AROUND (int)
+        mask: walk-around mask, 1 prints the raster without extrusion (int)
+        """
+        self._pending_coords.append(sp.get_coordinates(path))
+        self._pending_rows.append((flow, speed, kind, mask))
+
+    def __len__(self):
+        return len(self._offsets) + len(self._pending_rows)
+
+    def _build(self):
+        if not self._pending_rows:
+            return
+        coords = self._pending_coords
+        lengths = np.fromiter((len(c) for c in coords), dtype=np.int64, count=len(coords))
+        flow, speed, kind, mask = zip(*self._pending_rows)
+        flow = np.asarray(flow, dtype=np.float64)
+        mask = np.asarray(mask, dtype=np.int8)
+        new_coords = np.concatenate(coords) if coords else np.empty((0, 2))
+        offsets = len(self._coords) + np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # extrusão acumulada de cada raster, mesma ordem de operações do Raster (passo * fluxo * fator, somado em
+        # sequência a partir de 0), e fluxo nulo nos rasters com máscara
+        point_flow = np.repeat(np.where(mask == 1, 0, flow), lengths)
+        dx, dy = np.diff(new_coords[:, 0]), np.diff(new_coords[:, 1])
+        steps = np.zeros(len(new_coords))
+        factor = calculate() if self.layer_height is None else calculate(h=self.layer_height)
+        steps[1:] = np.sqrt((dx**2) + (dy**2)) * point_flow[1:] * factor
+        extrusion = np.zeros(len(new_coords))
+        start = 0
+        for length in lengths.tolist():
+            if length > 1:
+                np.cumsum(steps[start + 1:start + length], out=extrusion[start + 1:start + length])
+            start += length
+
+        self._coords = np.concatenate((self._coords, new_coords))
+        self._extrusion = np.concatenate((self._extrusion, extrusion))
+        self._offsets = np.concatenate((self._offsets, offsets))
+        self._lengths = np.concatenate((self._lengths, lengths))
+        self._flow = np.concatenate((self._flow, flow))
+        self._speed = np.concatenate((self._speed, np.asarray(speed, dtype=np.float64)))
+        self._kind = np.concatenate((self._kind, np.asarray(kind, dtype=np.int8)))
+        self._mask = np.concatenate((self._mask, mask))
+        self._pending_coords, self._pending_rows = [], []
+
+    @property
+    def coords(self) -> np.ndarray:
+        """(n, 2) coordinates of every raster, contiguous"""
+        self._build()
+        return self._coords
+
+    @property
+    def extrusion(self) -> np.ndarray:
+        """(n,) cumulative extrusion of each coordinate, restarting at 0 on each raster"""
+        self._build()
+        return self._extrusion
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Index of the first coordinate of each raster"""
+        self._build()
+        return self._offsets
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Number of coordinates of each raster"""
+        self._build()
+        return self._lengths
+
+    @property
+    def flow(self) -> np.ndarray:
+        self._build()
+        return self._flow
+
+    @property
+    def speed(self) -> np.ndarray:
+        self._build()
+        return self._speed
+
+    @property
+    def kind(self) -> np.ndarray:
+        self._build()
+        return self._kind
+
+    @property
+    def mask(self) -> np.ndarray:
+        self._build()
+        return self._mask
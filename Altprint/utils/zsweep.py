@@ -0,0 +1,109 @@
+import numpy as np
+
+# motor de fatiamento por varredura em z: os triângulos são ordenados uma única vez pelo z mínimo e cada plano só
+# intersecta os triângulos ativos na sua altura, em vez da malha inteira como no section_multiplane do trimesh
+
+
+class ZIntervalIndex:
+    """Triangle index sorted by z-min, sweeping the heights to find the triangles spanning each plane"""
+
+    def __init__(self, vertices, faces, tolerance: float = 1e-8):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.faces = np.asarray(faces, dtype=np.int64)
+        # the plane classification of trimesh treats |z - h| <= tolerance as "on the plane"
+        self.tolerance = tolerance
+        face_z = self.vertices[self.faces, 2]
+        self.zmin = face_z.min(axis=1)
+        self.zmax = face_z.max(axis=1)
+        self.order = np.argsort(self.zmin, kind='stable')  # faces by increasing z-min
+        self.zmin_sorted = self.zmin[self.order]
+
+    def sweep(self, heights):
+        """
+        Yields the faces spanning each height, visiting the heights in increasing order.
+
+        ARGS:
+        heights: section heights (list)
+
+        RETURNS:
+        Generator of (height index, sorted array of active face indexes)
+        """
+        heights = np.asarray(heights, dtype=np.float64)
+        active = np.empty(0, dtype=np.int64)
+        pointer = 0
+        for k in np.argsort(heights, kind='stable'):
+            h = heights[k]
+            # faces starting below the plane enter the active set ...
+            end = np.searchsorted(self.zmin_sorted, h + self.tolerance, side='right')
+            if end > pointer:
+                active = np.concatenate((active, self.order[pointer:end]))
+                pointer = end
+            # ... and leave it once they end below the plane
+            active = active[self.zmax[active] >= h - self.tolerance]
+            # original face order, so the segments come out as in a full mesh section
+            yield k, np.sort(active)
+
+
+class _LocalMesh:
+    """Minimal mesh view (vertices and faces) of the active faces, as accepted by trimesh.intersections.mesh_plane"""
+
+    def __init__(self, vertices, faces):
+        self.vertices = vertices
+        self.faces = faces
+
+
+def sweep_sections(vertices, faces, heights) -> list:
+    """
+    Slices a mesh at the given heights, only intersecting the faces active at each plane.
+
+    ARGS:
+    vertices: mesh vertices (n, 3) (array)
+    faces: mesh faces (m, 3) (array)
+    heights: section heights (list)
+
+    RETURNS:
+    List of trimesh Path2D (or None for empty sections), same as Trimesh.section_multiplane
+    """
+    paths = [None] * len(heights)
+    for k, path in iter_sweep_sections(vertices, faces, heights):
+        paths[k] = path
+    return paths
+
+
+def iter_sweep_sections(vertices, faces, heights):
+    """
+    Generator version of sweep_sections, yielding (height index, Path2D or None) in increasing height order.
+    """
+    from trimesh import geometry, intersections
+    from trimesh import transformations as tf
+    from trimesh.constants import tol
+    from trimesh.exchange.load import load_path
+
+    normal = np.array([0.0, 0.0, 1.0])
+    origin = np.zeros(3)
+    # same transforms as section_multiplane, so the 2D coordinates match
+    base_transform = np.linalg.inv(geometry.plane_transform(origin=origin, normal=normal))
+    translation = np.eye(4)
+
+    index = ZIntervalIndex(vertices, faces, tol.merge)
+    for k, active in index.sweep(heights):
+        if len(active) == 0:
+            yield k, None
+            continue
+        height = float(heights[k])
+        local_vertex_ids, local_faces = np.unique(index.faces[active], return_inverse=True)
+        local_mesh = _LocalMesh(index.vertices[local_vertex_ids], local_faces.reshape((-1, 3)))
+        lines, face_index = intersections.mesh_plane(
+            mesh=local_mesh,
+            plane_normal=normal,
+            plane_origin=origin + normal * height,
+            return_faces=True,
+            cached_dots=local_mesh.vertices[:, 2] - height)
+        if len(lines) == 0:
+            yield k, None
+            continue
+        translation[2, 3] = height
+        to_3D = np.dot(base_transform, translation)
+        lines_2D = tf.transform_points(lines.reshape((-1, 3)), np.linalg.inv(to_3D))
+        lines_2D = lines_2D[:, :2].reshape((-1, 2, 2))
+        yield k, load_path(lines_2D, metadata={"to_3D": to_3D, "face_index": active[face_index]})
@@ -0,0 +1,56 @@
+import json
+import statistics
+import subprocess
+import sys
+
+# mede o tempo de importação "a frio" do Altprint, cada medida em um interpretador novo (como um worker ou um job em
+# lote), e falha se passar do orçamento ou se um módulo pesado for carregado sem necessidade
+# uso: python import_benchmark.py [orçamento em ms]
+
+MODULE = "Altprint.core.flex_continuous"
+BUDGET_MS = 400  # cold-start budget of the median import
+RUNS = 5
+# only loaded by the code paths that need them (trimesh: slicing, networkx: best_path, tqdm: make_layers)
+LAZY_MODULES = ["matplotlib", "networkx", "trimesh", "tqdm", "scipy"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": 1000 * elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str = MODULE, runs: int = RUNS) -> tuple[list[float], set[str]]:
+    """
+    Imports a module in fresh interpreters.
+
+    RETURNS:
+    (import times in ms, heavy modules loaded by the import)
+    """
+    times = []
+    loaded: set[str] = set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        loaded.update(result["loaded"])
+    return times, loaded
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    times, loaded = measure()
+    median = statistics.median(times)
+    print("import {}: median {:.0f} ms, min {:.0f} ms, max {:.0f} ms (budget {:.0f} ms)".format(
+        MODULE, median, min(times), max(times), budget))
+    failed = False
+    if loaded:
+        print("eagerly imported: {}".format(", ".join(sorted(loaded))))
+        failed = True
+    if median > budget:
+        print("over the cold-start budget")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,43 @@
+import os
+import pytest
+from Altprint.core.flex_continuous import FlexProcess, FlexPrint
+from Altprint.utils.slicer import STLSlicer
+from Altprint.utils.height_method import StandartHeightMethod
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_process(model="Bar/barH", **settings) -> FlexProcess:
+    """Process of the dev parameters on a bundled sample model (config/stl/<model>.stl and <model>_flex.stl)"""
+    process = FlexProcess(settings_file=os.path.join(ROOT, "config/parameters/dev_flex_parameters.yml"))
+    process.verbose = False
+    # o slicer padrão é um objeto só, compartilhado por todos os FlexProcess: cada peça ganha o seu
+    process.slicer = STLSlicer(StandartHeightMethod())
+    process.start_script = os.path.join(ROOT, "out/gcode/start.gcode")
+    process.end_script = os.path.join(ROOT, "out/gcode/end.gcode")
+    process.model_file = os.path.join(ROOT, "config/stl/{}.stl".format(model))
+    process.flex_model_file = os.path.join(ROOT, "config/stl/{}_flex.stl".format(model))
+    for name, value in settings.items():
+        setattr(process, name, value)
+    return process
+
+
+@pytest.fixture
+def make_print():
+    def make(**settings) -> FlexPrint:
+        return FlexPrint(sample_process(**settings))
+    return make
+
+
+@pytest.fixture
+def gcode_of(tmp_path):
+    """Exports a FlexPrint (building it first if it has no layers) and returns the gcode text"""
+    def export(part: FlexPrint, name: str = "part") -> str:
+        filename = str(tmp_path / "{}.gcode".format(name))
+        if part.layers:
+            part.export_gcode(filename)
+        else:
+            part.build(filename)
+        with open(filename) as f:
+            return f.read()
+    return export
@@ -0,0 +1,78 @@
+import trimesh
+from Altprint.utils.slicer import STLSlicer
+from Altprint.utils.height_method import StandartHeightMethod
+
+
+def test_flow_sweep_after_flex_update(tmp_path, make_print):
+    # edição do modelo flexível numa camada que guarda a chave de camadas copiadas do cache, seguida de uma
+    # varredura de fluxo: só os rasters e o gcode rodam de novo, com o mesmo resultado de uma geração completa. As
+    # seções simplificadas deixam as camadas do prisma iguais, para que sejam copiadas do cache
+    settings = {"reuse_layers": True, "section_simplify_tolerance": 1e-6}
+    part = make_print(**settings)
+    part.build()
+    height = part.heights[2] - part.process.offset[2]
+    flex = trimesh.load_mesh(part.process.flex_model_file)
+    bounds = flex.bounds
+    box = trimesh.creation.box(extents=[0.6, 0.6, 0.1])
+    box.apply_translation([bounds[0][0] + 0.5, bounds[0][1] + 0.5, height])
+    edited = str(tmp_path / "edited_flex.stl")
+    trimesh.util.concatenate([flex, box]).export(edited)
+    assert part.update_flex(edited)
+    assert any(work.cached for work in part._works.values())
+
+    for flow in (0.8, 1.4):
+        part.process.flow = flow
+        assert part.build(str(tmp_path / "swept.gcode")) == ["rasters", "gcode"]
+        reference = make_print(flow=flow, flex_model_file=edited, **settings)
+        reference.build(str(tmp_path / "reference.gcode"))
+        assert (tmp_path / "swept.gcode").read_text() == (tmp_path / "reference.gcode").read_text()
+
+
+def test_build_after_slicing_change(make_print, gcode_of):
+    # outro offset muda as alturas: nenhuma camada da execução anterior pode sobrar, e a saia começa do zero
+    part = make_print()
+    part.build()
+    part.process.offset = (100, 100, 0.1)
+    assert part.build()[0] == "slicing"
+    assert list(part.layers) == part.heights
+    assert gcode_of(part) == gcode_of(make_print(offset=(100, 100, 0.1)), "reference")
+
+
+def test_make_layers_twice(make_print, gcode_of):
+    part = make_print()
+    part.slice()
+    part.make_layers()
+    part.slice()
+    part.make_layers()
+    assert gcode_of(part) == gcode_of(make_print(), "reference")
+
+
+def test_slicer_compared_by_settings(make_print, gcode_of):
+    part = make_print()
+    part.build()
+    # um slicer novo com as mesmas configurações não refaz nada
+    part.process.slicer = STLSlicer(StandartHeightMethod())
+    assert part.build() == []
+    # a altura de camada alterada no próprio objeto refaz o fatiamento
+    part.process.slicer.height_method.layer_height = 0.3
+    assert part.build()[0] == "slicing"
+    assert gcode_of(part) == gcode_of(make_print(slicer=STLSlicer(StandartHeightMethod(0.3))), "reference")
+
+
+def test_update_flex_with_joint_slicing(tmp_path, make_print, gcode_of):
+    # região flexível fora da peça em xy: o fatiamento conjunto deixa as seções vazias, e update_flex também
+    flex = trimesh.load_mesh(make_print().process.flex_model_file)
+    files = []
+    for k, shift in enumerate((300, 310)):
+        moved = flex.copy()
+        moved.apply_translation([shift, 0, 0])
+        files.append(str(tmp_path / "far_flex{}.stl".format(k)))
+        moved.export(files[-1])
+    part = make_print(joint_slicing=True, flex_model_file=files[0])
+    part.build()
+    part.update_flex(files[1])
+    reference = make_print(joint_slicing=True, flex_model_file=files[1])
+    reference.slice()
+    assert all(part.flex_planes.planes[h].equals_exact(reference.flex_planes.planes[h], 0) for h in part.heights)
+    assert all(part.flex_planes.planes[h].is_empty for h in part.heights)
+    assert gcode_of(part) == gcode_of(reference, "reference")
@@ -0,0 +1,60 @@
+import pytest
+import trimesh
+from shapely.geometry import LineString
+from Altprint.utils.flex_tagging import RegionTagger, NORMAL, GAP
+from Altprint.utils.lineutil import split_by_regions
+
+
+def test_walk_around_without_regions():
+    lines = [LineString([(0, 0), (10, 0)]), LineString([(10, 0), (10, 5)]), LineString([(10, 5), (0, 5)])]
+    tagger = RegionTagger([])
+    pieces, masks = tagger.split_walk_around(lines, [0, 1, 0])
+    assert [piece.wkb for piece in pieces] == [line.wkb for line in lines]
+    assert masks == [0, 1, 0]
+    assert tagger.tag_infill(pieces).tolist() == [NORMAL] * 3
+
+
+def test_walk_around_layers_without_flex_regions(tmp_path, make_print):
+    # região flexível acima da peça: nenhuma camada tem regiões para cortar as linhas
+    flex = trimesh.load_mesh(make_print().process.flex_model_file)
+    flex.apply_translation([0, 0, 50])
+    flex_file = str(tmp_path / "far_flex.stl")
+    flex.export(flex_file)
+    part = make_print(apply_walk_around=True, threshold_walk_around=5, flex_model_file=flex_file)
+    part.build(str(tmp_path / "part.gcode"))
+    assert all(work.infill_tags.tolist() == [NORMAL] * len(work.infill_paths) for work in part._works.values())
+
+
+def region_tags(paths, regions, gapped=None) -> list:
+    # testes path.within(region.buffer(...)) feitos caminho a caminho no código original
+    tags = []
+    for path in paths:
+        tag = NORMAL
+        for k, region in enumerate(regions if gapped is None else gapped):
+            if path.within(region.buffer(0.01, join_style=2)):
+                tag = k
+                break
+            elif gapped is not None and any(path.within(flex.buffer(0.02, join_style=2)) for flex in regions):
+                tag = GAP
+        tags.append(tag)
+    return tags
+
+
+@pytest.mark.parametrize("settings", [{"horizontal_gap_flex_infill": True},
+                                      {"apply_walk_around": True, "threshold_walk_around": 5}],
+                         ids=["gaps", "walk-around"])
+def test_tags_match_split_by_regions(tmp_path, make_print, settings):
+    part = make_print(model="S_ciclo_henrique/s_ciclo_H", **settings)
+    part.build(str(tmp_path / "part.gcode"))
+    works = [work for work in part._works.values() if work.flex_regions]
+    assert works
+    for work in works:
+        layer, regions = work.layer, work.flex_regions
+        perimeter = list(split_by_regions(layer.perimeter_paths, regions).geoms)
+        assert [path.wkb for path in work.perimeter_paths] == [path.wkb for path in perimeter]
+        assert work.perimeter_tags.tolist() == region_tags(perimeter, regions)
+        if settings.get("apply_walk_around"):
+            infill = list(split_by_regions(None, regions, layer, True).geoms)
+            assert [path.wkb for path in work.infill_paths] == [path.wkb for path in infill]
+            assert work.infill_masks == layer.mask_sliced_region_walk_around
+        assert work.infill_tags.tolist() == region_tags(work.infill_paths, regions, work.flex_regions_gapped.geoms)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import trimesh
+from Altprint.utils.flow import calculate
+from Altprint.utils.height_method import AdaptiveHeightMethod
+from Altprint.utils.slicer import STLSlicer
+
+
+def test_adaptive_last_layer_at_max_height():
+    # paredes verticais: camadas de max_height até o topo, sem dividir a última por erro de ponto flutuante
+    box = trimesh.creation.box(extents=(10, 10, 3))
+    box.apply_translation([0, 0, 1.5])
+    method = AdaptiveHeightMethod()
+    heights = method.get_heights(box.bounds, box)
+    assert heights == pytest.approx([0.3, 0.6, 0.9, 1.2, 1.5, 1.8, 2.1, 2.4, 2.7, 2.999])
+    assert method.get_thicknesses(box.bounds, heights) == pytest.approx([0.3] * 10)
+
+
+def test_adaptive_thicknesses_cover_the_model():
+    sphere = trimesh.creation.icosphere(subdivisions=3, radius=5)
+    sphere.apply_translation([0, 0, 5])
+    method = AdaptiveHeightMethod()
+    thicknesses = method.get_thicknesses(sphere.bounds, method.get_heights(sphere.bounds, sphere))
+    assert min(thicknesses) >= method.min_height - 1e-9 and max(thicknesses) <= method.max_height + 1e-9
+    assert sum(thicknesses) == pytest.approx(10)
+
+
+def test_adaptive_layers_extrude_for_their_thickness(make_print):
+    part = make_print(slicer=STLSlicer(AdaptiveHeightMethod()))
+    part.build()
+    for height, layer in part.layers.items():
+        toolpath = layer.toolpath
+        assert toolpath.layer_height == part.layer_thicknesses[height] == pytest.approx(0.3)
+        k = 0  # primeiro raster da saia
+        start, end = toolpath.offsets[k], toolpath.offsets[k] + toolpath.lengths[k]
+        coords = toolpath.coords[start:end]
+        length = np.sqrt((np.diff(coords, axis=0)**2).sum(axis=1)).sum()
+        expected = length * toolpath.flow[k] * calculate(h=0.3)
+        assert toolpath.extrusion[end - 1] == pytest.approx(expected)
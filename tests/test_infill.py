@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import shapely as sp
+from shapely.geometry import Point, Polygon, box
+from Altprint.utils.boustrophedon_infill import boustrophedon_fill
+from Altprint.utils.rectilinear_infill import rectilinear_fill
+from Altprint.utils.scanline_fill import scanline_fill
+
+
+def sample_shapes() -> list:
+    # formas com concavidades e buracos, onde uma ligação entre rasters pode sair da borda
+    rng = np.random.default_rng(1)
+    shapes = [box(0, 0, 10, 5), box(0, 0, 10, 5).difference(box(2, 1, 4, 3)),
+              Polygon([(0, 0), (10, 0), (10, 10), (5, 5), (0, 10)]),
+              Polygon([(0, 0), (12, 0), (12, 8), (8, 8), (8, 2), (4, 2), (4, 8), (0, 8)])]
+    for _ in range(8):
+        outer = Point(rng.uniform(-5, 5), rng.uniform(-5, 5)).buffer(rng.uniform(5, 15), int(rng.integers(2, 16)))
+        holes = [Point(rng.uniform(-8, 8), rng.uniform(-8, 8)).buffer(rng.uniform(0.3, 2), int(rng.integers(1, 8)))
+                 for _ in range(int(rng.integers(0, 12)))]
+        shape = outer.difference(sp.union_all(holes)) if holes else outer
+        shapes.extend(sp.get_parts(shape))
+    return shapes
+
+
+@pytest.mark.parametrize("angle", [0, 30, 45, 90])
+def test_boustrophedon_stays_inside_the_border(angle):
+    for shape in sample_shapes():
+        paths = boustrophedon_fill(shape, 0.5, angle)
+        assert shape.buffer(1e-5).covers(paths)
+
+
+def horizontal_segments(paths) -> set:
+    # rasters de comprimento não nulo de um preenchimento a 0°, sem as ligações entre eles
+    segments = set()
+    for path in sp.get_parts(paths):
+        coords = np.round(sp.get_coordinates(path), 6).tolist()
+        segments.update((a[1], min(a[0], b[0]), max(a[0], b[0])) for a, b in zip(coords[:-1], coords[1:])
+                        if a[1] == b[1] and a[0] != b[0])
+    return segments
+
+
+@pytest.mark.parametrize("gap", [0.5, 0.37])
+@pytest.mark.parametrize("angle", [0, 30, 90])
+def test_scanline_matches_rectilinear(gap, angle):
+    for shape in sample_shapes()[:6]:
+        assert scanline_fill(shape, gap, angle).wkb == rectilinear_fill(shape, gap, angle).wkb
+
+
+def test_boustrophedon_covers_the_scanline_rasters():
+    # mesmas linhas de varredura que o preenchimento retilíneo, só a ligação entre elas muda; as linhas que passam
+    # por um vértice da borda ficam de fora, nelas os dois contam as arestas horizontais de forma diferente
+    for shape in sample_shapes():
+        vertices = set(np.round(sp.get_coordinates(shape)[:, 1], 6).tolist())
+        boustrophedon, scanline = [{segment for segment in horizontal_segments(paths) if segment[0] not in vertices}
+                                   for paths in (boustrophedon_fill(shape, 0.5), scanline_fill(shape, 0.5))]
+        assert boustrophedon == scanline
@@ -0,0 +1,26 @@
+import pytest
+
+
+def layer_blocks(part) -> dict:
+    # gcode de cada camada, como layer_at devolve
+    exporter = part._gcode_exporter()
+    blocks = {}
+    for height, layer in part.layers.items():
+        blocks[height] = []
+        exporter.toolpath_gcode(layer.toolpath, height, blocks[height])
+    return blocks
+
+
+@pytest.mark.parametrize("settings", [{}, {"reuse_layers": True, "section_simplify_tolerance": 1e-6}])
+def test_layer_at_matches_make_layers(make_print, settings):
+    eager = make_print(**settings)
+    eager.build()
+    expected = layer_blocks(eager)
+    # camadas lidas de cima para baixo e fora de ordem: o cache vê as camadas numa ordem diferente de make_layers
+    lazy = make_print(**settings)
+    lazy.slice()
+    heights = list(reversed(lazy.heights[1::2])) + lazy.heights[::2]
+    for height in heights:
+        assert lazy.layer_at(height)[1] == expected[height]
+    if settings:
+        assert lazy.layer_cache.hits > 0
@@ -0,0 +1,21 @@
+from shapely.geometry import Polygon
+from Altprint.utils.layer_cache import LayerCache
+
+
+def test_key_is_exact():
+    # mesmo quadrado com um vértice colinear a mais: outra chave, a camada copiada poderia ter outra trajetória
+    square = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)])
+    collinear = Polygon([(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)])
+    cache = LayerCache()
+    key = cache.make_key(square, [], [], (1, ))
+    assert key == cache.make_key(Polygon(square.exterior.coords), [], [], (1, ))
+    assert key != cache.make_key(collinear, [], [], (1, ))
+    assert key != cache.make_key(square, [], [], (2, ))
+
+
+def test_reused_layers_match_generated(make_print, gcode_of):
+    # seções simplificadas: as camadas do prisma ficam iguais e são copiadas, com o mesmo gcode
+    part = make_print(reuse_layers=True, section_simplify_tolerance=1e-6)
+    reused = gcode_of(part)
+    assert part.layer_cache.hits > 0
+    assert reused == gcode_of(make_print(section_simplify_tolerance=1e-6), "reference")
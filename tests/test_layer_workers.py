@@ -0,0 +1,29 @@
+import os
+import pytest
+from Altprint.utils.rectilinear_infill import RectilinearInfill
+
+
+class WorkerFailingInfill(RectilinearInfill):
+    """Infill that fails only in the layer workers, which build it without a FlexPrint"""
+
+    def prepare_infill(self, layer, gap, angle):
+        if self.flex_print_ref is None:
+            raise RuntimeError("worker failure")
+        super().prepare_infill(layer, gap, angle)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_layer_pool_matches_serial(make_print, gcode_of, shared):
+    part = make_print(layer_workers=2, shared_memory_transport=shared)
+    assert gcode_of(part) == gcode_of(make_print(), "reference")
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_worker_errors_reach_the_caller(make_print, shared):
+    # um erro no pool não pode virar uma nova execução da camada em série, e nenhum bloco compartilhado sobra
+    part = make_print(layer_workers=2, shared_memory_transport=shared, infill_method=WorkerFailingInfill)
+    part.slice()
+    before = set(os.listdir("/dev/shm"))
+    with pytest.raises(RuntimeError, match="worker failure"):
+        part.make_layers()
+    assert set(os.listdir("/dev/shm")) <= before
@@ -0,0 +1,19 @@
+def test_streamed_reslice_uses_the_cache(tmp_path, make_print, gcode_of):
+    settings = {"stream_slicing": True, "slice_cache_dir": str(tmp_path / "cache")}
+    first = gcode_of(make_print(**settings), "first")
+    part = make_print(**settings)
+    part.slice()
+    # alturas e seções vêm do cache: nenhuma das malhas é carregada
+    assert part._model_slicer.model is None and part._flex_slicer.model is None
+    assert gcode_of(part, "second") == first
+    assert part._model_slicer.model is None and part._flex_slicer.model is None
+    assert first == gcode_of(make_print(), "reference")
+
+
+def test_non_stream_entry_serves_stream(tmp_path, make_print, gcode_of):
+    cache_dir = str(tmp_path / "cache")
+    reference = gcode_of(make_print(slice_cache_dir=cache_dir), "reference")
+    part = make_print(stream_slicing=True, slice_cache_dir=cache_dir)
+    part.slice()
+    assert gcode_of(part) == reference
+    assert part._model_slicer.model is None and part._flex_slicer.model is None
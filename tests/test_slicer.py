@@ -0,0 +1,28 @@
+import os
+import pytest
+from Altprint.utils.slicer import STLSlicer
+from Altprint.utils.height_method import StandartHeightMethod
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS = ["Bar/barH", "Bar/barH_flex", "Quebra/quebra", "S_ciclo_henrique/s_ciclo_curv"]
+
+
+def sections(model, shared=False, **options) -> dict:
+    slicer = STLSlicer(StandartHeightMethod(), **options)
+    slicer.shared_transport = shared
+    slicer.load_model(os.path.join(ROOT, "config/stl/{}.stl".format(model)))
+    slicer.translate_model([100, 100, 0])
+    return {height: section.wkb for height, section in slicer.slice_model().planes.items()}
+
+
+@pytest.mark.parametrize("model", MODELS)
+@pytest.mark.parametrize("options", [{"engine": "sweep"}, {"workers": 2}, {"workers": 2, "shared": True}],
+                         ids=["sweep", "bands", "bands-shared"])
+def test_sections_match_trimesh(model, options):
+    # seções de section_multiplane sobre a malha inteira, numa só chamada, como no código original
+    assert sections(model, **options) == sections(model)
+
+
+def test_sliced_gcode_matches_trimesh(make_print, gcode_of):
+    part = make_print(slice_engine="sweep", slice_workers=2)
+    assert gcode_of(part) == gcode_of(make_print(), "reference")
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from Altprint.utils.flow import calculate
+
+
+def raster_extrusion(coords, flow, mask) -> np.ndarray:
+    # laço ponto a ponto da classe Raster original
+    _flow = 0 if mask == 1 else flow
+    extrusion = np.zeros(len(coords))
+    for i in range(1, len(coords)):
+        dx = abs(coords[i, 0] - coords[i - 1, 0])
+        dy = abs(coords[i, 1] - coords[i - 1, 1])
+        extrusion[i] = np.sqrt((dx**2) + (dy**2)) * _flow * calculate() + extrusion[i-1]
+    return extrusion
+
+
+@pytest.mark.parametrize("settings", [{}, {"horizontal_gap_flex_infill": True},
+                                      {"apply_walk_around": True, "threshold_walk_around": 5}],
+                         ids=["default", "gaps", "walk-around"])
+def test_extrusion_matches_rasters(tmp_path, make_print, settings):
+    # camadas com regiões flexíveis, gaps e desvios sem extrusão (máscara 1)
+    part = make_print(model="S_ciclo_henrique/s_ciclo_H", **settings)
+    part.build(str(tmp_path / "part.gcode"))
+    for layer in part.layers.values():
+        toolpath = layer.toolpath
+        for start, length, flow, mask in zip(toolpath.offsets, toolpath.lengths, toolpath.flow, toolpath.mask):
+            expected = raster_extrusion(toolpath.coords[start:start + length], flow, mask)
+            np.testing.assert_array_equal(toolpath.extrusion[start:start + length], expected)